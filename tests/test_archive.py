@@ -0,0 +1,57 @@
+import os
+import unittest
+import tempfile
+import numpy
+from uptick.archive import Archive
+
+DTYPE = [("time", "<u4"), ("value", "<f8")]
+
+
+class Testcases(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        archive = Archive(self.path, DTYPE)
+        self.assertEqual(len(archive), 0)
+        self.assertEqual(len(archive.read()), 0)
+        archive.append([(1, 1.0), (1, 2.0)])
+        archive.append(numpy.array([(2, 3.0)], dtype=DTYPE))
+
+        # Reopen without dtype, it is taken from the metadata
+        archive = Archive(self.path)
+        records = archive.read()
+        self.assertEqual(len(archive), 3)
+        self.assertEqual(list(records["time"]), [1, 1, 2])
+        self.assertEqual(list(records["value"]), [1.0, 2.0, 3.0])
+
+        groups = [(int(t), list(r["value"])) for t, r in archive.groupby("time")]
+        self.assertEqual(groups, [(1, [1.0, 2.0]), (2, [3.0])])
+
+    def test_groupby_empty(self):
+        self.assertEqual(list(Archive(self.path, DTYPE).groupby("time")), [])
+
+    def test_export(self):
+        archive = Archive(self.path, DTYPE)
+        archive.append([(1, 1.0), (2, 2.0)])
+        path = os.path.join(self.directory.name, "test.npz")
+        archive.export(path)
+        with numpy.load(path) as data:
+            self.assertEqual(list(data["value"]), [1.0, 2.0])
+
+    def test_dtype_mismatch(self):
+        Archive(self.path, DTYPE)
+        with self.assertRaises(ValueError):
+            Archive(self.path, [("time", "<u8")])
+
+    def test_missing(self):
+        with self.assertRaises(ValueError):
+            Archive(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
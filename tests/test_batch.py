@@ -0,0 +1,37 @@
+import unittest
+from uptick.batch import chunk_operations, TRANSACTION_OVERHEAD, OPERATION_OVERHEAD
+
+
+class Op:
+    def __init__(self, size):
+        self.size = size
+
+    def __bytes__(self):
+        return b"\x00" * self.size
+
+
+class Testcases(unittest.TestCase):
+    def test_size_limit(self):
+        op_size = 100 + OPERATION_OVERHEAD
+        ops = [Op(100) for _ in range(10)]
+        chunks = chunk_operations(ops, TRANSACTION_OVERHEAD + 3 * op_size)
+        self.assertEqual([len(c) for c in chunks], [3, 3, 3, 1])
+        self.assertEqual([op for c in chunks for op in c], ops)
+
+    def test_op_limit(self):
+        ops = [Op(10) for _ in range(7)]
+        chunks = chunk_operations(ops, 1024 * 1024, max_ops=3)
+        self.assertEqual([len(c) for c in chunks], [3, 3, 1])
+
+    def test_oversized_operation(self):
+        # An operation that exceeds the budget still gets its own chunk
+        ops = [Op(10), Op(10000), Op(10)]
+        chunks = chunk_operations(ops, TRANSACTION_OVERHEAD + 100)
+        self.assertEqual([len(c) for c in chunks], [1, 1, 1])
+
+    def test_empty(self):
+        self.assertEqual(chunk_operations([], 1024), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from collections import Counter
+from bitsharesbase.account import PrivateKey, Address
+from uptick.cli import vanity_probability, BASE58_ALPHABET
+
+
+class Testcases(unittest.TestCase):
+    def sample(self, address, num=2000):
+        chars = Counter()
+        for _ in range(num):
+            key = PrivateKey()
+            if address:
+                encoded = str(
+                    Address.from_pubkey(
+                        key.pubkey, compressed=True, version=56, prefix="BTS"
+                    )
+                )
+            else:
+                encoded = format(key.pubkey, "BTS")
+            chars[encoded[3]] += 1
+        return chars, num
+
+    def assertMatchesSample(self, address):
+        chars, num = self.sample(address)
+        probabilities = {c: vanity_probability(c, address) for c in BASE58_ALPHABET}
+        self.assertAlmostEqual(sum(probabilities.values()), 1.0)
+        for char, count in chars.items():
+            self.assertGreater(probabilities[char], 0, char)
+        distance = sum(
+            abs(chars[c] / num - probabilities[c]) for c in BASE58_ALPHABET
+        )
+        self.assertLess(distance / 2, 0.1)
+
+    def test_vanity_probability_pubkey(self):
+        self.assertMatchesSample(address=False)
+        for char in "123abcxyz":
+            self.assertEqual(vanity_probability(char), 0)
+        self.assertGreater(vanity_probability("5abc"), 0)
+
+    def test_vanity_probability_address(self):
+        self.assertMatchesSample(address=True)
+        # Example address of graphenelib
+        self.assertGreater(vanity_probability("FN9r6", address=True), 0)
+        self.assertAlmostEqual(vanity_probability("1", address=True), 1 / 256)
+
+
+if __name__ == "__main__":
+    unittest.main()
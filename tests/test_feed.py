@@ -0,0 +1,60 @@
+import unittest
+import numpy
+from uptick.feed import producer_statistics, FEED_DTYPE
+
+nan = float("nan")
+
+
+def records(rows):
+    """ Feed records from (time, producer, settlement, median) tuples
+    """
+    return numpy.array(
+        [(t, 0, p, t, s, s, m, 1750, 1100) for t, p, s, m in rows], dtype=FEED_DTYPE
+    )
+
+
+class Testcases(unittest.TestCase):
+    def test_statistics(self):
+        data = records(
+            [
+                # Unsorted, producer 2 before 1 and times shuffled
+                (3, 2, 1.0, 1.0),
+                (1, 1, 1.1, 1.0),
+                (2, 1, 0.9, 1.0),
+                (1, 2, 1.0, 1.0),
+                (3, 1, 1.0, nan),
+            ]
+        )
+        sorted_records, producers, counts, ends, statistics = producer_statistics(data)
+        deviation, mean_deviation, max_deviation, volatility = statistics
+
+        self.assertEqual(list(producers), [1, 2])
+        self.assertEqual(list(counts), [3, 2])
+        self.assertEqual(list(sorted_records["producer"]), [1, 1, 1, 2, 2])
+        self.assertEqual(list(sorted_records["time"]), [1, 2, 3, 1, 3])
+        # The last snapshot of each producer
+        self.assertEqual(list(sorted_records["time"][ends]), [3, 3])
+
+        numpy.testing.assert_allclose(deviation[:2], [10, -10])
+        # Snapshots without a median are ignored
+        self.assertTrue(numpy.isnan(deviation[2]))
+        numpy.testing.assert_allclose(mean_deviation, [0, 0], atol=1e-12)
+        numpy.testing.assert_allclose(max_deviation, [10, 0])
+
+        # Volatility from the log changes within each producer only
+        changes = numpy.diff(numpy.log([1.1, 0.9, 1.0]))
+        self.assertAlmostEqual(volatility[0], numpy.std(changes) * 100)
+        self.assertEqual(volatility[1], 0)
+
+    def test_single_snapshot(self):
+        _, _, counts, _, statistics = producer_statistics(records([(1, 1, nan, 1.0)]))
+        deviation, mean_deviation, max_deviation, volatility = statistics
+        self.assertEqual(list(counts), [1])
+        # Neither deviations nor changes are available
+        self.assertTrue(numpy.isnan(mean_deviation[0]))
+        self.assertTrue(numpy.isnan(max_deviation[0]))
+        self.assertTrue(numpy.isnan(volatility[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import numpy
+from unittest import mock
+from types import SimpleNamespace
+from uptick.markets import ladder, walk_orderbook, account_limit_orders
+
+
+class FakeRPC:
+    def __init__(self, orders, page_size):
+        self.orders = orders
+        self.page_size = page_size
+        self.calls = 0
+
+    def get_account_limit_orders(
+        self, account, base, quote, limit, ostart_id=None, ostart_price=None
+    ):
+        self.calls += 1
+        orders = [o for o in self.orders if o["base"] == base]
+        if ostart_id is not None:
+            ids = [o["id"] for o in orders]
+            orders = orders[ids.index(ostart_id) + 1:]
+        return orders[: min(limit, self.page_size)]
+
+
+class Testcases(unittest.TestCase):
+    def test_ladder_flat(self):
+        prices, amounts = ladder("sell", 2.0, 1.0, 5, 100)
+        numpy.testing.assert_allclose(prices, [1.0, 1.25, 1.5, 1.75, 2.0])
+        numpy.testing.assert_allclose(amounts, [20] * 5)
+
+    def test_ladder_geometric(self):
+        prices, amounts = ladder(
+            "sell", 1.0, 8.0, 4, 30, spacing="geometric", weighting="geometric"
+        )
+        numpy.testing.assert_allclose(prices, [1.0, 2.0, 4.0, 8.0])
+        self.assertAlmostEqual(amounts.sum(), 30)
+        self.assertAlmostEqual(amounts[-1] / amounts[0], 2.0)
+
+    def test_ladder_buy_reversed(self):
+        _, sell = ladder("sell", 1.0, 2.0, 4, 10, weighting="linear", ratio=3.0)
+        _, buy = ladder("buy", 1.0, 2.0, 4, 10, weighting="linear", ratio=3.0)
+        numpy.testing.assert_allclose(buy, sell[::-1])
+        # Buy orders grow away from the market, i.e. towards lower prices
+        self.assertAlmostEqual(buy[0] / buy[-1], 3.0)
+
+    def test_walk_orderbook(self):
+        filled, levels = walk_orderbook(
+            [10, 10, 10], [20, 30, 40], [0, 5, 10, 15, 30, 31]
+        )
+        numpy.testing.assert_allclose(filled[:5], [0, 10, 20, 35, 90])
+        self.assertTrue(numpy.isnan(filled[5]))
+        self.assertEqual(list(levels), [0, 1, 1, 2, 3, 4])
+
+    def test_account_limit_orders_paging(self):
+        orders = [dict(id="1.7.{}".format(i), base="A", sell_price=i) for i in range(5)]
+        orders.append(dict(id="1.7.5", base="B", sell_price=5))
+        rpc = FakeRPC(orders, page_size=2)
+        ctx = SimpleNamespace(bitshares=SimpleNamespace(rpc=rpc))
+        with mock.patch("uptick.markets.ORDERS_PER_CALL", 2):
+            result = account_limit_orders(ctx, "alice", "A", "B")
+        self.assertEqual([o["id"] for o in result], [o["id"] for o in orders])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy
+from bitshares import BitShares
+from bitshares.storage import InRamConfigurationStore, InRamPlainKeyStore
+from uptick.pools import Pool, market_fee
+
+
+def asset(id, symbol, precision, flags=0, market_fee_percent=0, max_market_fee=0):
+    return dict(
+        id=id,
+        symbol=symbol,
+        precision=precision,
+        issuer="1.2.0",
+        dynamic_asset_data_id="2.3." + id.split(".")[2],
+        options=dict(
+            flags=flags,
+            issuer_permissions=0,
+            market_fee_percent=market_fee_percent,
+            max_market_fee=max_market_fee,
+            description="",
+            extensions={},
+        ),
+    )
+
+
+class Testcases(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.bts = BitShares(
+            offline=True,
+            config_store=InRamConfigurationStore(),
+            key_store=InRamPlainKeyStore(),
+        )
+        cls.core = asset("1.3.0", "BTS", 5)
+        # 1% market fee capped at 1 USD
+        cls.usd = asset("1.3.121", "USD", 4, 0x01, 100, 10000)
+        cls.share = asset("1.3.5000", "BTSUSD", 5)
+
+    def pool(self, assets=None):
+        data = dict(
+            id="1.19.0",
+            asset_a="1.3.0",
+            asset_b="1.3.121",
+            share_asset="1.3.5000",
+            balance_a=100000 * 10 ** 5,
+            balance_b=1000 * 10 ** 4,
+            virtual_value=100000 * 10 ** 5 * 1000 * 10 ** 4,
+            taker_fee_percent=30,
+            withdrawal_fee_percent=0,
+        )
+        dynamic = dict(current_supply=10 ** 10)
+        assets = assets or [self.core, self.usd, self.share]
+        return Pool.from_objects(data, dynamic, assets, self.bts)
+
+    def test_market_fee(self):
+        pool = self.pool()
+        amounts = numpy.array([10.0, 50.0, 500.0])
+        numpy.testing.assert_allclose(market_fee(amounts, pool.asset_b), [0.1, 0.5, 1])
+        numpy.testing.assert_allclose(market_fee(amounts, pool.asset_a), [0, 0, 0])
+
+    def test_taker_fee_percent(self):
+        usd = dict(self.usd)
+        usd["options"] = dict(usd["options"], extensions=dict(taker_fee_percent=50))
+        pool = self.pool(assets=[self.core, usd, self.share])
+        numpy.testing.assert_allclose(market_fee([10.0], pool.asset_b), [0.1])
+        numpy.testing.assert_allclose(
+            market_fee([10.0], pool.asset_b, maker=False), [0.05]
+        )
+
+    def test_exchange(self):
+        pool = self.pool()
+        received = pool.exchange(numpy.array([1000.0, 10.0]))
+        # 1000 * 1000 / 101000 less the 0.3% pool fee and 1% USD market fee
+        expected = 1000 * 1000 / 101000 * 0.997 * 0.99
+        self.assertAlmostEqual(received[0], expected)
+        numpy.testing.assert_allclose(received, [9.77257426, 0.09869313])
+
+    def test_exchange_b(self):
+        pool = self.pool()
+        received = pool.exchange(numpy.array([10.0]), sell_a=False)
+        # The market fee on the sold USD is paid before the pool trades
+        expected = 100000 * 9.9 / 1009.9 * 0.997
+        self.assertAlmostEqual(received[0], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
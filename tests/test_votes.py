@@ -0,0 +1,31 @@
+import unittest
+import numpy
+from uptick.votes import ranks, fund_workers
+
+
+class Testcases(unittest.TestCase):
+    def test_ranks(self):
+        self.assertEqual(list(ranks(numpy.array([5, 10, 0, 7]))), [2, 0, 3, 1])
+
+    def test_ranks_ties_are_stable(self):
+        self.assertEqual(list(ranks(numpy.array([3, 3, 3]))), [0, 1, 2])
+
+    def test_fund_workers(self):
+        votes = numpy.array([5, 10, 0, 7])
+        daily_pay = numpy.array([3, 4, 5, 6])
+        # 10 votes gets 4, 7 votes the remaining 4, the rest nothing
+        self.assertEqual(list(fund_workers(votes, daily_pay, 8)), [0, 4, 0, 4])
+
+    def test_fund_workers_without_votes(self):
+        votes = numpy.array([0, 0])
+        daily_pay = numpy.array([1, 1])
+        self.assertEqual(list(fund_workers(votes, daily_pay, 100)), [0, 0])
+
+    def test_fund_workers_large_budget(self):
+        votes = numpy.array([1, 2, 3])
+        daily_pay = numpy.array([10, 20, 30])
+        self.assertEqual(list(fund_workers(votes, daily_pay, 1000)), [10, 20, 30])
+
+
+if __name__ == '__main__':
+    unittest.main()
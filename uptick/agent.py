@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import click
+import socket
+import logging
+from .main import main
+from .ui import print_message, print_table
+
+log = logging.getLogger(__name__)
+
+#: Seconds the agent keeps a master key by default
+DEFAULT_TIMEOUT = 15 * 60
+
+#: Seconds the agent waits for a client to send its request
+CLIENT_TIMEOUT = 1
+
+#: Seconds a client waits for the agent to respond
+AGENT_TIMEOUT = 5
+
+
+def available():
+    """ Whether the platform supports the agent (unix sockets and fork)
+    """
+    return hasattr(socket, "AF_UNIX") and hasattr(os, "fork")
+
+
+def socket_path():
+    """ Path of the agent's unix socket, taken from ``UPTICK_AGENT_SOCK``
+        or placed in uptick's application directory
+    """
+    if "UPTICK_AGENT_SOCK" in os.environ:
+        return os.environ["UPTICK_AGENT_SOCK"]
+    return os.path.join(click.get_app_dir("uptick"), "agent.sock")
+
+
+def request(command, **kwargs):
+    """ Send a command to the agent and return its response
+
+        Returns ``None`` if no agent is running.
+    """
+    if not available():
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(AGENT_TIMEOUT)
+    try:
+        client.connect(socket_path())
+        client.sendall(json.dumps(dict(command=command, **kwargs)).encode() + b"\n")
+        return json.loads(client.makefile().readline() or "null")
+    except (OSError, ValueError):
+        return None
+    finally:
+        client.close()
+
+
+def wallet_id(store):
+    """ Identify a wallet by the file it is stored in
+    """
+    return getattr(store, "sqlite_file", "default")
+
+
+def unlock_from_agent(store):
+    """ Unlock the wallet's key store with the master key held by the
+        agent
+
+        This relies on internals of the key store (the encrypted master
+        key's checksum, ``decrypted_master`` and ``password``). Returns
+        ``False`` whenever those are missing or the key does not match,
+        so that the caller falls back to asking for the passphrase.
+    """
+    internals = ["config", "config_key", "_derive_checksum", "decrypted_master"]
+    if not all(hasattr(store, attr) for attr in internals + ["password"]):
+        return False
+    response = request("get", wallet=wallet_id(store))
+    if not response or not response.get("key"):
+        return False
+    key = response["key"]
+    try:
+        checksum = store.config[store.config_key].split("$")[0]
+        if store._derive_checksum(key) != checksum:
+            return False
+    except Exception:
+        return False
+    store.decrypted_master = key
+    # The store considers itself unlocked once a password is set
+    store.password = True
+    return True
+
+
+def set_master_key(store):
+    """ Hand the decrypted master key of an unlocked wallet to the agent
+        (if one is running)
+    """
+    key = getattr(store, "decrypted_master", None)
+    if key:
+        request("set", wallet=wallet_id(store), key=key)
+
+
+class Agent:
+    """ Keeps decrypted wallet master keys in memory for a limited time
+        and serves them via a unix socket that only the user can access
+    """
+
+    def __init__(self, path, timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.keys = dict()
+        self.running = False
+
+    def expire(self):
+        now = time.time()
+        for wallet in [w for w, (_, until) in self.keys.items() if until < now]:
+            log.info("Master key of {} expired".format(wallet))
+            self.keys.pop(wallet)
+
+    def handle(self, message):
+        self.expire()
+        command = message.get("command")
+        if command == "get":
+            key, _ = self.keys.get(message.get("wallet"), (None, None))
+            return dict(key=key)
+        elif command == "set":
+            self.keys[message["wallet"]] = (message["key"], time.time() + self.timeout)
+            return dict(ok=True)
+        elif command == "lock":
+            self.keys.clear()
+            return dict(ok=True)
+        elif command == "status":
+            now = time.time()
+            return dict(
+                pid=os.getpid(),
+                wallets={w: int(until - now) for w, (_, until) in self.keys.items()},
+            )
+        elif command == "stop":
+            self.running = False
+            return dict(ok=True)
+        return dict(error="Unknown command {}".format(command))
+
+    def serve(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, mode=0o700)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        # Wake up regularly to drop expired keys
+        server.settimeout(1)
+        self.running = True
+        try:
+            while self.running:
+                self.expire()
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    continue
+                with connection:
+                    connection.settimeout(CLIENT_TIMEOUT)
+                    try:
+                        message = json.loads(connection.makefile().readline())
+                        response = self.handle(message)
+                    except (ValueError, KeyError, AttributeError) as e:
+                        response = dict(error=str(e))
+                    except OSError:
+                        continue
+                    try:
+                        connection.sendall(json.dumps(response).encode() + b"\n")
+                    except OSError:
+                        continue
+        finally:
+            self.keys.clear()
+            server.close()
+            os.remove(self.path)
+
+
+@main.group()
+def agent():
+    """ Keep the unlocked wallet in memory (like ssh-agent)
+
+        While the agent is running, commands that need the wallet
+        obtain its master key from the agent instead of asking for the
+        passphrase. The key is handed to the agent after the next
+        regular unlock and forgotten after --timeout seconds.
+    """
+    pass
+
+
+@agent.command()
+@click.option(
+    "--timeout",
+    type=int,
+    default=DEFAULT_TIMEOUT,
+    help="Seconds to keep the master key",
+)
+@click.option("--foreground", is_flag=True, help="Do not detach from the terminal")
+def start(timeout, foreground):
+    """ Start the agent
+    """
+    if not available():
+        print_message("The agent requires unix sockets", "error")
+        return
+    if request("status"):
+        print_message("Agent is already running at {}".format(socket_path()), "warning")
+        return
+    server = Agent(socket_path(), timeout)
+    if foreground:
+        server.serve()
+        return
+    if os.fork():
+        print_message("Agent listening at {}".format(socket_path()))
+        click.echo("export UPTICK_AGENT_SOCK={}".format(socket_path()))
+        return
+    os.setsid()
+    with open(os.devnull, "r+") as devnull:
+        for fd in range(3):
+            os.dup2(devnull.fileno(), fd)
+    server.serve()
+    os._exit(0)
+
+
+@agent.command()
+def stop():
+    """ Stop the agent
+    """
+    if not request("stop"):
+        print_message("No agent running", "warning")
+
+
+@agent.command()
+def lock():
+    """ Make the agent forget all master keys
+    """
+    if not request("lock"):
+        print_message("No agent running", "warning")
+
+
+@agent.command()
+def status():
+    """ Show the status of the agent
+    """
+    response = request("status")
+    if not response:
+        print_message("No agent running", "warning")
+        return
+    t = [["wallet", "expires in"]]
+    for wallet, seconds in response["wallets"].items():
+        t.append([wallet, "{}s".format(seconds)])
+    print_message("Agent running at {} (pid {})".format(socket_path(), response["pid"]))
+    print_table(t)
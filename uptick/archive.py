@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+
+class Archive:
+    """ Append-only archive of fixed-size records
+
+        Records of a numpy ``dtype`` are appended as raw bytes to ``path``
+        while the dtype and further metadata are stored in ``path.json``.
+        Reading maps the file into memory, hence even archives of several
+        months can be replayed without loading them at once.
+
+        :param str path: File name of the archive
+        :param list dtype: numpy dtype of the records (required to create
+            a new archive)
+    """
+
+    def __init__(self, path, dtype=None):
+        import numpy
+
+        self.path = path
+        self.metadata_path = path + ".json"
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path) as fid:
+                self.metadata = json.load(fid)
+            self.dtype = numpy.dtype([tuple(x) for x in self.metadata["dtype"]])
+            if dtype is not None and numpy.dtype(dtype) != self.dtype:
+                raise ValueError(
+                    "Archive {} has been created with a different dtype".format(path)
+                )
+        elif dtype is not None:
+            self.dtype = numpy.dtype(dtype)
+            self.metadata = dict(dtype=self.dtype.descr)
+            self.save_metadata()
+        else:
+            raise ValueError("Archive {} does not exist".format(path))
+
+    def save_metadata(self):
+        """ Store the metadata (e.g. after modifying ``self.metadata``)
+        """
+        with open(self.metadata_path, "w") as fid:
+            json.dump(self.metadata, fid)
+
+    def append(self, records):
+        """ Append records (numpy array or list of tuples) to the archive
+        """
+        import numpy
+
+        records = numpy.asarray(records, dtype=self.dtype)
+        with open(self.path, "ab") as fid:
+            fid.write(records.tobytes())
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path) // self.dtype.itemsize
+
+    def read(self):
+        """ Return all records as read-only memory-mapped array
+        """
+        import numpy
+
+        if not len(self):
+            return numpy.zeros(0, dtype=self.dtype)
+        return numpy.memmap(self.path, dtype=self.dtype, mode="r", shape=(len(self),))
+
+    def groupby(self, field):
+        """ Iterate over runs of records with the same value of ``field``
+            (e.g. all records of one snapshot time)
+        """
+        import numpy
+
+        records = self.read()
+        if not len(records):
+            return
+        values = records[field]
+        bounds = numpy.flatnonzero(values[1:] != values[:-1]) + 1
+        bounds = [0] + list(bounds) + [len(records)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            yield values[start], records[start:stop]
+
+    def export(self, path):
+        """ Export the archive as compressed, columnar ``.npz`` file
+        """
+        import numpy
+
+        records = self.read()
+        numpy.savez_compressed(
+            path, **{name: records[name] for name in self.dtype.names}
+        )
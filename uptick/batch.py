@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+from .ui import print_message
+
+log = logging.getLogger(__name__)
+
+#: Bytes reserved per transaction for the header, fees and signatures
+TRANSACTION_OVERHEAD = 512
+
+#: Bytes reserved per operation for the operation id and the final fee
+OPERATION_OVERHEAD = 16
+
+#: Seconds between two polls for transaction confirmations
+CONFIRMATION_INTERVAL = 3
+
+#: Maximum number of objects requested with a single ``get_objects`` call
+OBJECTS_PER_CALL = 100
+
+#: Maximum number of keys looked up with a single ``get_key_references`` call
+KEYS_PER_CALL = 100
+
+#: Assets obtained so far, indexed by id
+_assets = dict()
+
+
+def max_transaction_size(ctx):
+    """ Maximum size of a transaction (in bytes) as defined by the
+        chain parameters
+    """
+    params = ctx.bitshares.rpc.get_global_properties()["parameters"]
+    return int(params["maximum_transaction_size"])
+
+
+def chunk_operations(ops, max_size, max_ops=None):
+    """ Split a list of operations into lists that each fit into a
+        single transaction of at most ``max_size`` bytes and ``max_ops``
+        operations.
+    """
+    budget = max_size - TRANSACTION_OVERHEAD
+    chunks = []
+    chunk, size = [], 0
+    for op in ops:
+        op_size = len(bytes(op)) + OPERATION_OVERHEAD
+        if chunk and (
+            size + op_size > budget or (max_ops and len(chunk) >= max_ops)
+        ):
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(op)
+        size += op_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def transaction_id(tx):
+    """ Obtain the id of a signed transaction given as dictionary
+    """
+    from bitsharesbase.signedtransactions import Signed_Transaction
+
+    return Signed_Transaction(**tx).id
+
+
+def broadcast_operations(
+    ctx, ops, account, permission="active", max_ops=None, wait=True
+):
+    """ Sign and broadcast ``ops`` in as many transactions as the
+        maximum transaction size of the chain (and ``max_ops``) requires.
+
+        All transactions are broadcast back to back. Unless ``wait`` is
+        ``False``, their inclusion into the blockchain is confirmed
+        afterwards (see :func:`wait_for_transactions`).
+    """
+    chunks = chunk_operations(ops, max_transaction_size(ctx), max_ops)
+    bundle = ctx.bitshares.bundle
+    ctx.bitshares.bundle = True
+    txs = []
+    try:
+        for chunk in chunks:
+            ctx.bitshares.finalizeOp(chunk, account, permission)
+            txs.append(ctx.bitshares.txbuffer.broadcast())
+    finally:
+        ctx.bitshares.bundle = bundle
+    log.info("Broadcast {} operations in {} transactions".format(len(ops), len(txs)))
+    if wait:
+        wait_for_transactions(ctx, txs)
+    return txs
+
+
+def wait_for_transactions(ctx, txs):
+    """ Wait until all (non-blocking) broadcast transactions have been
+        included into a block or have expired.
+    """
+    if ctx.bitshares.nobroadcast or ctx.bitshares.blocking:
+        return
+    pending = set(transaction_id(tx) for tx in txs if tx)
+    deadline = time.time() + ctx.obj.get("expiration", 30)
+    while pending and time.time() < deadline:
+        time.sleep(CONFIRMATION_INTERVAL)
+        for txid in list(pending):
+            if ctx.bitshares.rpc.get_recent_transaction_by_id(txid):
+                pending.discard(txid)
+    for txid in pending:
+        print_message("Transaction {} has not been confirmed".format(txid), "warning")
+
+
+def get_objects(ctx, ids):
+    """ Obtain many objects with as few ``get_objects`` calls as the API
+        limit of the node allows
+    """
+    ids = list(ids)
+    objects = []
+    for i in range(0, len(ids), OBJECTS_PER_CALL):
+        objects.extend(ctx.bitshares.rpc.get_objects(ids[i : i + OBJECTS_PER_CALL]))
+    return objects
+
+
+def get_assets(ctx, ids):
+    """ Obtain assets by id and keep them in a cache shared by all
+        commands. Only unknown assets are requested from the node.
+
+        Returns a dictionary that maps the asset ids to the asset objects.
+    """
+    missing = sorted(set(ids).difference(_assets))
+    for asset in get_objects(ctx, missing):
+        if asset:
+            _assets[asset["id"]] = asset
+    return {id: _assets[id] for id in ids if id in _assets}
+
+
+def get_key_references(ctx, pubkeys):
+    """ Look up the accounts that reference the given public keys with as
+        few ``get_key_references`` calls as the API limit allows
+
+        Returns a dictionary that maps each public key to the list of
+        account ids that reference it.
+    """
+    pubkeys = list(pubkeys)
+    references = dict()
+    for i in range(0, len(pubkeys), KEYS_PER_CALL):
+        chunk = pubkeys[i : i + KEYS_PER_CALL]
+        for key, ids in zip(chunk, ctx.bitshares.rpc.get_key_references(chunk)):
+            references[key] = sorted(set(ids))
+    return references
@@ -32,6 +32,8 @@ from . import (
     bip38,
     ticket,
     pools,
+    route,
+    agent,
 )
 from .ui import print_message, print_table, print_tx
 
@@ -97,28 +99,234 @@ def broadcast(ctx, filename):
     print_tx(tx.json())
 
 
+#: Number of keys a worker process generates per task
+KEYS_PER_TASK = 256
+
+
+def generate_keys(args):
+    """ Generate random keys (runs in a worker process)
+
+        Returns a list of (wif, pubkey) or (wif, pubkey, address) tuples.
+    """
+    num, prefix, address = args
+    keys = []
+    for _ in range(num):
+        wif = PrivateKey()
+        key = (str(wif), format(wif.pubkey, prefix))
+        if address:
+            key += (
+                str(
+                    Address.from_pubkey(
+                        wif.pubkey, compressed=True, version=56, prefix=prefix
+                    )
+                ),
+            )
+        keys.append(key)
+    return keys
+
+
 @main.command()
 @click.option("--prefix", type=str, default="BTS", help="The refix to use")
 @click.option("--num", type=int, default=1, help="The number of keys to derive")
 @click.option("--address/--no-address", default=False)
-def randomwif(prefix, num, address):
+@click.option(
+    "--format",
+    "output",
+    type=click.Choice(["table", "jsonl", "csv"]),
+    default="table",
+    help="Output format (jsonl and csv are streamed)",
+)
+@click.option("--workers", type=int, help="Number of processes (defaults to all cores)")
+def randomwif(prefix, num, address, output, workers):
     """ Obtain a random private/public key pair
     """
+    import csv
+    import time
+    from multiprocessing import Pool
+
+    header = ["wif", "pubkey", "address"] if address else ["wif", "pubkey"]
+    tasks = [
+        (min(KEYS_PER_TASK, num - i), prefix, address)
+        for i in range(0, num, KEYS_PER_TASK)
+    ]
+    t = [header]
+    writer = csv.writer(sys.stdout)
+    if output == "csv":
+        writer.writerow(header)
+    start = time.time()
+    # A process pool only pays off for more than a single task
+    if len(tasks) <= 1 or workers == 1:
+        pool = None
+        batches = map(generate_keys, tasks)
+    else:
+        pool = Pool(workers)
+        batches = pool.imap_unordered(generate_keys, tasks)
+    try:
+        for keys in batches:
+            if output == "table":
+                t.extend(keys)
+            elif output == "csv":
+                writer.writerows(keys)
+            else:
+                for key in keys:
+                    click.echo(json.dumps(dict(zip(header, key))))
+    finally:
+        if pool:
+            pool.terminate()
+    elapsed = time.time() - start
+    if output == "table":
+        print_table(t)
+    if output != "table" or len(tasks) > 1:
+        click.echo(
+            "{} keys in {:.2f}s ({:.0f} keys/s)".format(
+                num, elapsed, num / elapsed if elapsed else 0
+            ),
+            err=True,
+        )
+
+
+#: Number of keys a worker process tries per task in vanitykey
+VANITY_KEYS_PER_TASK = 2000
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def vanity_probability(pattern, address=False):
+    """ Probability that a random public key (or address) starts with
+        ``pattern`` after the prefix
+
+        The encoded bytes are not uniform over all base58 strings: a
+        compressed public key (plus checksum) is 37 bytes starting with
+        0x02 or 0x03, hence only some leading characters are reachable at
+        all. An address is a 20 byte hash plus checksum, i.e. 24 uniform
+        bytes, whose leading zero bytes are encoded as ``1``.
+    """
     if address:
-        t = [["wif", "pubkey", "address"]]
+        size, low, high = 24, 0, 256 ** 24
     else:
-        t = [["wif", "pubkey"]]
-    for n in range(0, num):
+        size, low, high = 37, 2 * 256 ** 36, 4 * 256 ** 36
+    matching = 0
+    # Values with ``zeros`` leading zero bytes are encoded as that many
+    # ``1`` followed by the base58 digits of the value
+    for zeros in range(size):
+        ones = pattern[:zeros]
+        if ones != "1" * len(ones):
+            break
+        zero_low = 256 ** (size - zeros - 1) if zeros < size - 1 else 1
+        zero_low, zero_high = max(low, zero_low), min(high, 256 ** (size - zeros))
+        if zero_low >= zero_high:
+            continue
+        rest = pattern[zeros:]
+        if not rest:
+            matching += zero_high - zero_low
+            continue
+        value = 0
+        for char in rest:
+            value = value * 58 + BASE58_ALPHABET.index(char)
+        # Sum over all numbers of base58 digits of the value
+        digits = len(rest)
+        while 58 ** (digits - 1) < zero_high:
+            width = 58 ** (digits - len(rest))
+            start = max(value * width, 58 ** (digits - 1), zero_low)
+            stop = min((value + 1) * width, 58 ** digits, zero_high)
+            matching += max(0, stop - start)
+            digits += 1
+    return matching / (high - low)
+
+
+def search_vanity_key(args):
+    """ Try random keys until one matches (runs in a worker process)
+
+        Returns (number of tries, (wif, pubkey/address) or None).
+    """
+    import re
+
+    pattern, prefix, address, regex, tries = args
+    if regex:
+        match = re.compile(pattern).search
+    else:
+
+        def match(text):
+            return text.startswith(pattern)
+
+    for n in range(1, tries + 1):
         wif = PrivateKey()
         if address:
-            address = Address.from_pubkey(
-                wif.pubkey, compressed=True, version=56, prefix=prefix
+            key = str(
+                Address.from_pubkey(
+                    wif.pubkey, compressed=True, version=56, prefix=prefix
+                )
             )
-            t.append([str(wif), format(wif.pubkey, prefix), str(address)])
         else:
-            t.append([str(wif), format(wif.pubkey, prefix)])
+            key = format(wif.pubkey, prefix)
+        if match(key[len(prefix) :]):
+            return n, (str(wif), key)
+    return tries, None
 
-    print_table(t)
+
+@main.command()
+@click.argument("pattern", type=str)
+@click.option("--prefix", type=str, default="BTS", help="The prefix to use")
+@click.option("--address", is_flag=True, help="Match the address instead")
+@click.option("--regex", is_flag=True, help="PATTERN is a regular expression")
+@click.option("--workers", type=int, help="Number of processes (defaults to all cores)")
+@click.option("--max-tries", type=int, help="Give up after trying this many keys")
+def vanitykey(pattern, prefix, address, regex, workers, max_tries):
+    """ Search a private key whose public key (or address) starts with
+        PATTERN (after the prefix)
+
+        Public keys can only start with 4 to 8 after the prefix, hence
+        plain patterns that can never match are rejected.
+        Beyond the first character, each character multiplies the
+        expected number of keys to try by about 58.
+    """
+    import os
+    import time
+    from multiprocessing import Pool
+
+    expected = None
+    if not regex:
+        invalid = set(pattern) - set(BASE58_ALPHABET)
+        if invalid:
+            print_message(
+                "Characters {} do not exist in base58".format("".join(sorted(invalid))),
+                "error",
+            )
+            return
+        probability = vanity_probability(pattern, address)
+        if not probability:
+            print_message(
+                "No {} can start with {}".format(
+                    "address" if address else "public key", pattern
+                ),
+                "error",
+            )
+            return
+        expected = 1 / probability
+
+    task = (pattern, prefix, address, regex, VANITY_KEYS_PER_TASK)
+    tries, found = 0, None
+    start = time.time()
+    processes = workers or os.cpu_count()
+    with Pool(processes) as pool:
+        # Keep every process busy without queuing an endless list of tasks
+        pending = [
+            pool.apply_async(search_vanity_key, (task,)) for _ in range(2 * processes)
+        ]
+        while not found and not (max_tries and tries >= max_tries):
+            n, found = pending.pop(0).get()
+            pending.append(pool.apply_async(search_vanity_key, (task,)))
+            tries += n
+            rate = tries / (time.time() - start)
+            status = "\r{} keys, {:.0f} keys/s".format(tries, rate)
+            if expected:
+                status += ", expected time {:.0f}s".format(expected / rate)
+            click.echo(status, nl=False, err=True)
+    click.echo(err=True)
+    if not found:
+        print_message("No match after {} keys".format(tries), "warning")
+        return
+    print_table([["wif", "address" if address else "pubkey"], list(found)])
 
 
 @main.command()
@@ -7,6 +7,7 @@ from bitshares.exceptions import WrongMasterPasswordException
 from bitshares.instance import set_shared_bitshares_instance
 from functools import update_wrapper
 from .ui import print_message
+from .agent import unlock_from_agent, set_master_key
 
 log = logging.getLogger(__name__)
 
@@ -119,6 +120,44 @@ def chain(f):
     return update_wrapper(new_func, f)
 
 
+def unlock_wallet(ctx):
+    """ Unlock the wallet by either asking for a passphrase or taking the
+        environmental variable ``UNLOCK``. A new wallet is created if
+        there is none yet.
+
+        If an unlock agent is running (see ``uptick agent``), the master
+        key is taken from the agent instead and handed to the agent after
+        unlocking with the passphrase.
+    """
+    if ctx.bitshares.wallet.created():
+        store = ctx.bitshares.wallet.store
+        if unlock_from_agent(store):
+            return
+        while True:
+            if "UNLOCK" in os.environ:
+                pwd = os.environ["UNLOCK"]
+            else:
+                pwd = click.prompt("Current Wallet Passphrase", hide_input=True)
+            try:
+                ctx.bitshares.wallet.unlock(pwd)
+            except WrongMasterPasswordException:
+                print_message("Incorrect Wallet passphrase!", "error")
+                continue
+            break
+        set_master_key(store)
+    else:
+        print_message("No wallet installed yet. Creating ...", "warning")
+        if "UNLOCK" in os.environ:
+            pwd = os.environ["UNLOCK"]
+        else:
+            pwd = click.prompt(
+                "Wallet Encryption Passphrase",
+                hide_input=True,
+                confirmation_prompt=True,
+            )
+        ctx.bitshares.wallet.create(pwd)
+
+
 def unlock(f):
     """ This decorator will unlock the wallet by either asking for a
         passphrase or taking the environmental variable ``UNLOCK``
@@ -127,29 +166,7 @@ def unlock(f):
     @click.pass_context
     def new_func(ctx, *args, **kwargs):
         if not ctx.obj.get("unsigned", False):
-            if ctx.bitshares.wallet.created():
-                while True:
-                    if "UNLOCK" in os.environ:
-                        pwd = os.environ["UNLOCK"]
-                    else:
-                        pwd = click.prompt("Current Wallet Passphrase", hide_input=True)
-                    try:
-                        ctx.bitshares.wallet.unlock(pwd)
-                    except WrongMasterPasswordException:
-                        print_message("Incorrect Wallet passphrase!", "error")
-                        continue
-                    break
-            else:
-                print_message("No wallet installed yet. Creating ...", "warning")
-                if "UNLOCK" in os.environ:
-                    pwd = os.environ["UNLOCK"]
-                else:
-                    pwd = click.prompt(
-                        "Wallet Encryption Passphrase",
-                        hide_input=True,
-                        confirmation_prompt=True,
-                    )
-                ctx.bitshares.wallet.create(pwd)
+            unlock_wallet(ctx)
         return ctx.invoke(f, *args, **kwargs)
 
     return update_wrapper(new_func, f)
@@ -1,16 +1,20 @@
-import math
+import re
+import time
+import calendar
+import yaml
 import click
 from prettytable import PrettyTable
 from pprint import pprint
-from tqdm import tqdm
 from bitshares.market import Market
 from bitshares.price import Price
 from bitshares.witness import Witness, Witnesses
 from bitshares.asset import Asset
+from bitshares.account import Account
 from datetime import datetime, timedelta
 from .decorators import onlineChain, unlockWallet
 from .main import main, config
-from .ui import print_tx
+from .ui import print_tx, print_message, print_table
+from .batch import get_objects, get_assets, broadcast_operations
 
 
 @main.command()
@@ -67,6 +71,209 @@ def newfeed(ctx, symbol, price, market, cer, mssr, mcr, account):
     )
 
 
+@main.command()
+@click.pass_context
+@onlineChain
+@click.argument("pricefile", type=click.File("r"))
+@click.option(
+    "--account",
+    help="Account that takes this action",
+    default=config["default_account"],
+    type=str,
+)
+@click.option(
+    "--mssr",
+    help="Default percentage for max short squeeze ratio (e.g., 110)",
+    default=110,
+    type=float,
+)
+@click.option(
+    "--mcr",
+    help="Default percentage for maintenance collateral ratio (e.g., 200)",
+    default=200,
+    type=float,
+)
+@unlockWallet
+def newfeeds(ctx, pricefile, mssr, mcr, account):
+    """ Publish many price feeds at once
+
+        PRICEFILE is a YAML (or JSON) file that maps asset symbols to a
+        price or to a dictionary with the keys ``price``, ``market``
+        (defaults to SYMBOL/BACKING), ``cer``, ``mcr`` and ``mssr``:
+
+            \b
+            USD: 0.01
+            CNY:
+              price: 14.5
+              market: BTS/CNY
+              mcr: 175
+
+        The CER defaults to the settlement price with a 5% premium (only
+        for assets backed by the core asset), see ``uptick newfeed``. All
+        feeds are published in as few transactions as the maximum
+        transaction size of the chain allows.
+    """
+    from bitsharesbase import operations
+
+    entries = dict()
+    for symbol, entry in yaml.safe_load(pricefile).items():
+        if not isinstance(entry, dict):
+            entry = dict(price=entry)
+        try:
+            float(entry["price"])
+        except (KeyError, TypeError, ValueError):
+            print_message(
+                "A valid price needs to be provided for {}".format(symbol), "warning"
+            )
+            return
+        if "market" in entry and len(re.split("[:/]", str(entry["market"]))) != 2:
+            print_message(
+                "Invalid market {} for {} (expected BASE/QUOTE)".format(
+                    entry["market"], symbol
+                ),
+                "warning",
+            )
+            return
+        entries[str(symbol).upper()] = entry
+    try:
+        objects, all_assets = load_bitassets(ctx, list(entries.keys()))
+    except ValueError as e:
+        print_message(str(e), "warning")
+        return
+    assets = {
+        asset["symbol"]: Asset(asset, bitshares_instance=ctx.bitshares)
+        for asset in all_assets.values()
+    }
+    core = Asset(all_assets["1.3.0"], bitshares_instance=ctx.bitshares)
+    account = Account(account, bitshares_instance=ctx.bitshares)
+
+    ops = []
+    for asset in objects:
+        symbol = asset["symbol"]
+        entry = entries[symbol]
+        backing = all_assets[asset["bitasset_data"]["options"]["short_backing_asset"]]
+        market = entry.get("market", "{}/{}".format(symbol, backing["symbol"]))
+        base, quote = re.split("[:/]", str(market).upper())
+        if sorted([base, quote]) != sorted([symbol, backing["symbol"]]):
+            print_message(
+                "The market of {} needs to be {}/{}".format(
+                    symbol, symbol, backing["symbol"]
+                ),
+                "warning",
+            )
+            return
+        settlement = Price(
+            float(entry["price"]),
+            base=assets[base],
+            quote=assets[quote],
+            bitshares_instance=ctx.bitshares,
+        ).as_base(symbol)
+        if entry.get("cer"):
+            cer = Price(
+                float(entry["cer"]),
+                quote=assets[symbol],
+                base=core,
+                bitshares_instance=ctx.bitshares,
+            )
+        elif backing["id"] == "1.3.0":
+            cer = settlement.as_quote(symbol) * 0.95
+        else:
+            print_message(
+                "A CER needs to be provided for {} as it is not backed by {}".format(
+                    symbol, core["symbol"]
+                ),
+                "warning",
+            )
+            return
+        ops.append(
+            operations.Asset_publish_feed(
+                **{
+                    "fee": {"amount": 0, "asset_id": "1.3.0"},
+                    "publisher": account["id"],
+                    "asset_id": asset["id"],
+                    "feed": {
+                        "settlement_price": settlement.json(),
+                        "core_exchange_rate": cer.as_base(symbol).json(),
+                        "maximum_short_squeeze_ratio": int(
+                            entry.get("mssr", mssr) * 10
+                        ),
+                        "maintenance_collateral_ratio": int(
+                            entry.get("mcr", mcr) * 10
+                        ),
+                    },
+                    "prefix": ctx.bitshares.prefix,
+                }
+            )
+        )
+    for tx in broadcast_operations(ctx, ops, account["name"]):
+        print_tx(tx)
+
+
+def feed_price(price, asset_id, assets):
+    """ Price (as float) of a feed price object with asset ``asset_id``
+        as base. Returns ``None`` for empty prices.
+    """
+    base, quote = price["base"], price["quote"]
+    if base["asset_id"] != asset_id:
+        base, quote = quote, base
+    if not int(base["amount"]) or not int(quote["amount"]):
+        return None
+    base_precision = assets[base["asset_id"]]["precision"]
+    quote_precision = assets[quote["asset_id"]]["precision"]
+    return (
+        int(base["amount"])
+        / int(quote["amount"])
+        * 10 ** (quote_precision - base_precision)
+    )
+
+
+def load_bitassets(ctx, symbols):
+    """ Load many bitassets with their bitasset data in two batched calls
+
+        Returns the asset objects (with ``bitasset_data``) and a
+        dictionary of the assets, their backing assets and the core asset
+        indexed by id.
+    """
+    assets = ctx.bitshares.rpc.lookup_asset_symbols(list(symbols))
+    for symbol, asset in zip(symbols, assets):
+        if not asset:
+            raise ValueError("Unknown asset {}".format(symbol))
+        if not asset.get("bitasset_data_id"):
+            raise ValueError("{} is not a bitasset".format(symbol))
+    bitasset_data = get_objects(ctx, [asset["bitasset_data_id"] for asset in assets])
+    asset_ids = set(["1.3.0"])
+    for asset, data in zip(assets, bitasset_data):
+        asset["bitasset_data"] = data
+        asset_ids.add(asset["id"])
+        asset_ids.add(data["options"]["short_backing_asset"])
+    return assets, get_assets(ctx, asset_ids)
+
+
+def load_feeds(ctx, symbols):
+    """ Load the feeds of many bitassets together with the active
+        witnesses and all involved accounts in a constant number of
+        batched calls.
+
+        Returns the asset objects (with ``bitasset_data``), the active
+        witness accounts and dictionaries of all involved accounts and
+        assets (indexed by id).
+    """
+    assets, all_assets = load_bitassets(ctx, symbols)
+    properties = ctx.bitshares.rpc.get_global_properties()
+    witnesses = get_objects(ctx, properties["active_witnesses"])
+    witness_accounts = [witness["witness_account"] for witness in witnesses]
+
+    account_ids = set(witness_accounts)
+    for asset in assets:
+        account_ids.update(producer for producer, _ in asset["bitasset_data"]["feeds"])
+    accounts = {
+        account["id"]: account
+        for account in get_objects(ctx, sorted(account_ids))
+        if account
+    }
+    return assets, witness_accounts, accounts, all_assets
+
+
 @main.command()
 @click.pass_context
 @onlineChain
@@ -78,30 +285,40 @@ def newfeed(ctx, symbol, price, market, cer, mssr, mcr, account):
 def feeds(ctx, assets, pricethreshold, maxage):
     """ Price Feed Overview
     """
-    import builtins
+    import numpy
 
-    witnesses = Witnesses(bitshares_instance=ctx.bitshares)
+    try:
+        assets, witness_accounts, accounts, all_assets = load_feeds(ctx, assets)
+    except ValueError as e:
+        print_message(str(e), "warning")
+        return
 
-    def test_price(p, ref):
-        if math.fabs(float(p / ref) - 1.0) > pricethreshold / 100.0:
-            return click.style(str(p), fg="red")
-        elif math.fabs(float(p / ref) - 1.0) > pricethreshold / 2.0 / 100.0:
-            return click.style(str(p), fg="yellow")
-        else:
-            return click.style(str(p), fg="green")
-
-    def price_diff(p, ref):
-        d = (float(p) - float(ref)) / float(ref) * 100
-        if math.fabs(d) >= 5:
-            color = "red"
-        elif math.fabs(d) >= 2.5:
-            color = "yellow"
-        else:
-            color = "green"
-        return click.style("{:8.2f}%".format(d), fg=color)
+    def format_price(price, asset):
+        base, quote = price["base"]["asset_id"], price["quote"]["asset_id"]
+        other = quote if base == asset["id"] else base
+        value = feed_price(price, asset["id"], all_assets)
+        return value, "{:f} {}/{}".format(
+            value or 0, asset["symbol"], all_assets[other]["symbol"]
+        )
+
+    def deviations(values, ref):
+        """ Relative deviations of many prices from a reference (nan if
+            either is missing)
+        """
+        values = numpy.array([v or numpy.nan for v in values], dtype=float)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            return values / (ref or numpy.nan) - 1
+
+    def colors(deviations, threshold):
+        deviations = numpy.abs(deviations)
+        return numpy.select(
+            [~numpy.isfinite(deviations) | (deviations > threshold)],
+            ["red"],
+            numpy.where(deviations > threshold / 2, "yellow", "green"),
+        )
 
     def test_date(d):
-        t = d.replace(tzinfo=None)
+        t = datetime.strptime(d, "%Y-%m-%dT%H:%M:%S")
         now = datetime.utcnow()
         if now < t + timedelta(minutes=maxage):
             return click.style(str(t), fg="green")
@@ -111,7 +328,7 @@ def feeds(ctx, assets, pricethreshold, maxage):
             return click.style(str(t), fg="red")
 
     output = ""
-    for asset in tqdm(assets):
+    for asset in assets:
         t = PrettyTable(
             [
                 "Asset",
@@ -127,45 +344,51 @@ def feeds(ctx, assets, pricethreshold, maxage):
         )
         t.align = "c"
         t.align["Producer"] = "l"
-        asset = Asset(asset, full=True, bitshares_instance=ctx.bitshares)
-        current_feed = asset.feed
-        feeds = asset.feeds
-        producingwitnesses = builtins.set()
-        witness_accounts = [x["witness_account"] for x in witnesses]
-        for feed in tqdm(feeds):
-            producingwitnesses.add(feed["producer"]["id"])
+        current_feed = asset["bitasset_data"]["current_feed"]
+        settlement = feed_price(current_feed["settlement_price"], asset["id"], all_assets)
+        cer = feed_price(current_feed["core_exchange_rate"], asset["id"], all_assets)
+        feeds = asset["bitasset_data"]["feeds"]
+        settlements = [
+            format_price(feed["settlement_price"], asset) for _, (_, feed) in feeds
+        ]
+        cers = [
+            format_price(feed["core_exchange_rate"], asset) for _, (_, feed) in feeds
+        ]
+        # All deviations and their colors are computed at once per asset
+        settlement_colors = colors(
+            deviations([v for v, _ in settlements], settlement), pricethreshold / 100
+        )
+        cer_deviations = deviations([v for v, _ in cers], cer)
+        cer_colors = colors(cer_deviations, pricethreshold / 100)
+        diff_colors = colors(cer_deviations, 0.05)
+        producingwitnesses = set()
+        for i, (producer, (date, feed)) in enumerate(feeds):
+            producingwitnesses.add(producer)
+            if numpy.isfinite(cer_deviations[i]):
+                diff = "{:8.2f}%".format(cer_deviations[i] * 100)
+            else:
+                diff = "{:>9}".format("n/a")
             t.add_row(
                 [
                     asset["symbol"],
-                    feed["producer"]["name"],
+                    accounts[producer]["name"],
                     click.style(
-                        "X" if feed["producer"]["id"] in witness_accounts else "",
-                        bold=True,
-                    ),
-                    test_date(feed["date"]),
-                    test_price(
-                        feed["settlement_price"], current_feed["settlement_price"]
-                    ),
-                    test_price(
-                        feed["core_exchange_rate"], current_feed["core_exchange_rate"]
+                        "X" if producer in witness_accounts else "", bold=True
                     ),
+                    test_date(date),
+                    click.style(settlements[i][1], fg=str(settlement_colors[i])),
+                    click.style(cers[i][1], fg=str(cer_colors[i])),
                     feed["maintenance_collateral_ratio"] / 10,
                     feed["maximum_short_squeeze_ratio"] / 10,
-                    price_diff(
-                        feed["core_exchange_rate"], current_feed["core_exchange_rate"]
-                    ),
+                    click.style(diff, fg=str(diff_colors[i])),
                 ]
             )
-        for missing in builtins.set(witness_accounts).difference(producingwitnesses):
-            witness = Witness(missing)
+        for missing in set(witness_accounts).difference(producingwitnesses):
             t.add_row(
                 [
                     click.style(asset["symbol"], bg="red"),
-                    click.style(witness.account["name"], bg="red"),
-                    click.style(
-                        "X" if feed["producer"]["id"] in witness_accounts else "",
-                        bold=True,
-                    ),
+                    click.style(accounts[missing]["name"], bg="red"),
+                    click.style("X", bold=True),
                     click.style(str(datetime(1970, 1, 1))),
                     click.style("missing", bg="red"),
                     click.style("missing", bg="red"),
@@ -177,3 +400,203 @@ def feeds(ctx, assets, pricethreshold, maxage):
         output += t.get_string(sortby="Date", reversesort=True)
         output += "\n"
     click.echo(output)
+
+
+#: Record layout of feed history archives
+FEED_DTYPE = [
+    ("time", "<u4"),
+    ("asset", "<u4"),
+    ("producer", "<u4"),
+    ("date", "<u4"),
+    ("settlement", "<f8"),
+    ("cer", "<f8"),
+    ("median", "<f8"),
+    ("mcr", "<u2"),
+    ("mssr", "<u2"),
+]
+
+
+def instance(id):
+    """ Instance number of an object id
+    """
+    return int(id.split(".")[2])
+
+
+@main.group()
+def feedhistory():
+    """ Record and analyze price feeds over time
+    """
+    pass
+
+
+@feedhistory.command()
+@click.pass_context
+@onlineChain
+@click.argument("assets", nargs=-1, required=True)
+@click.option("--archive", default="feeds.bin", help="Archive to append to")
+@click.option("--interval", type=float, default=600, help="Seconds between snapshots")
+@click.option("--count", type=int, default=0, help="Number of snapshots (0: forever)")
+def record(ctx, assets, archive, interval, count):
+    """ Record the feeds of bitassets into an archive
+
+        Every ``--interval`` seconds, the feeds of all ASSETS are appended
+        to a compact binary archive (see :class:`uptick.archive.Archive`).
+    """
+    from .archive import Archive
+
+    def timestamp(date):
+        return calendar.timegm(time.strptime(date, "%Y-%m-%dT%H:%M:%S"))
+
+    archive = Archive(archive, FEED_DTYPE)
+    snapshots = 0
+    while not count or snapshots < count:
+        start = time.time()
+        objects, all_assets = load_bitassets(ctx, [a.upper() for a in assets])
+        records = []
+        for asset in objects:
+            data = asset["bitasset_data"]
+            median = feed_price(
+                data["current_feed"]["settlement_price"], asset["id"], all_assets
+            )
+            for producer, (date, feed) in data["feeds"]:
+                records.append(
+                    (
+                        int(start),
+                        instance(asset["id"]),
+                        instance(producer),
+                        timestamp(date),
+                        feed_price(feed["settlement_price"], asset["id"], all_assets)
+                        or float("nan"),
+                        feed_price(feed["core_exchange_rate"], asset["id"], all_assets)
+                        or float("nan"),
+                        median or float("nan"),
+                        feed["maintenance_collateral_ratio"],
+                        feed["maximum_short_squeeze_ratio"],
+                    )
+                )
+        archive.append(records)
+        snapshots += 1
+        if not count or snapshots < count:
+            time.sleep(max(0, interval - (time.time() - start)))
+
+
+def producer_statistics(records):
+    """ Compute the per-producer statistics of archived feed records
+
+        Returns the records sorted by producer and time, the producers,
+        the number of snapshots and the index of the last snapshot of
+        each producer, and a tuple of the deviation of every record as
+        well as the mean deviation, maximum absolute deviation and
+        volatility (in percent) of every producer.
+    """
+    import numpy
+
+    # Group the records by producer (and time within each producer)
+    records = records[numpy.lexsort((records["time"], records["producer"]))]
+    producers, starts, counts = numpy.unique(
+        records["producer"], return_index=True, return_counts=True
+    )
+    ends = starts + counts - 1
+
+    def grouped(values, reduce, empty):
+        """ Reduce the finite ``values`` per producer (nan if there are none)
+        """
+        valid = numpy.isfinite(values)
+        result = reduce.reduceat(numpy.where(valid, values, empty), starts)
+        valid_counts = numpy.add.reduceat(valid.astype(int), starts)
+        return numpy.where(valid_counts > 0, result, numpy.nan), valid_counts
+
+    # Empty feeds and snapshots without a median are stored as nan and
+    # must not spoil the statistics of a producer's other snapshots
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        deviation = (records["settlement"] / records["median"] - 1) * 100
+        total, valid_counts = grouped(deviation, numpy.add, 0)
+        mean_deviation = total / valid_counts
+        max_deviation, _ = grouped(numpy.abs(deviation), numpy.maximum, -numpy.inf)
+
+        # Log changes between consecutive snapshots of the same producer
+        changes = numpy.diff(numpy.log(records["settlement"]), prepend=numpy.nan)
+        changes[starts] = numpy.nan
+        total, change_counts = grouped(changes, numpy.add, 0)
+        mean_change = total / change_counts
+        total, _ = grouped(changes ** 2, numpy.add, 0)
+        variance = total / change_counts - mean_change ** 2
+        volatility = numpy.sqrt(numpy.maximum(variance, 0)) * 100
+
+    return (
+        records,
+        producers,
+        counts,
+        ends,
+        (deviation, mean_deviation, max_deviation, volatility),
+    )
+
+
+@feedhistory.command()
+@click.pass_context
+@onlineChain
+@click.argument("asset")
+@click.option("--archive", default="feeds.bin", help="Archive to analyze")
+@click.option("--days", type=float, default=7, help="Only analyze the last days")
+def stats(ctx, asset, archive, days):
+    """ Show per-producer feed statistics of a bitasset
+
+        Deviations are relative to the median feed at the time of each
+        snapshot, the volatility is the standard deviation of the log
+        changes of a producer's price between snapshots.
+    """
+    import numpy
+    from .archive import Archive
+
+    [data] = ctx.bitshares.rpc.lookup_asset_symbols([asset.upper()])
+    if not data:
+        print_message("Unknown asset {}".format(asset), "warning")
+        return
+    now = time.time()
+    records = Archive(archive).read()
+    records = records[
+        (records["asset"] == instance(data["id"]))
+        & (records["time"] >= now - days * 24 * 60 * 60)
+    ]
+    if not len(records):
+        print_message("No feeds recorded for {}".format(data["symbol"]), "warning")
+        return
+
+    records, producers, counts, ends, statistics = producer_statistics(records)
+    deviation, mean_deviation, max_deviation, volatility = statistics
+
+    def percent(value, format="{:+.2f}%"):
+        return format.format(value) if numpy.isfinite(value) else "n/a"
+
+    names = {
+        account["id"]: account["name"]
+        for account in get_objects(ctx, ["1.2.{}".format(p) for p in producers])
+        if account
+    }
+    t = [
+        [
+            "producer",
+            "snapshots",
+            "deviation",
+            "mean deviation",
+            "max deviation",
+            "volatility",
+            "last feed",
+            "staleness",
+        ]
+    ]
+    for i, producer in enumerate(producers):
+        last = records[ends[i]]
+        t.append(
+            [
+                names.get("1.2.{}".format(producer), producer),
+                counts[i],
+                percent(deviation[ends[i]]),
+                percent(mean_deviation[i]),
+                percent(max_deviation[i], "{:.2f}%"),
+                percent(volatility[i], "{:.2f}%"),
+                datetime.utcfromtimestamp(int(last["date"])),
+                "{:.1f}h".format((now - last["date"]) / 3600),
+            ]
+        )
+    print_table(t)
@@ -1,4 +1,9 @@
+import re
+import json
+import sys
+import time
 import click
+import logging
 from click_datetime import Datetime
 from datetime import datetime, timedelta
 from bitshares.market import Market
@@ -6,9 +11,12 @@ from bitshares.amount import Amount
 from bitshares.account import Account
 from bitshares.price import Price, Order
 from .decorators import onlineChain, unlockWallet, online, unlock
-from .ui import print_tx, print_table, format_table
+from .ui import print_tx, print_table, format_table, print_message
+from .batch import broadcast_operations, wait_for_transactions, get_assets
 from .main import main, config
 
+log = logging.getLogger(__name__)
+
 
 @main.command()
 @click.pass_context
@@ -135,6 +143,153 @@ def orderbook(ctx, market):
     print_table(t)
 
 
+def walk_orderbook(volumes, counter_volumes, sizes):
+    """ Fill orders of many ``sizes`` against one side of an orderbook
+
+        ``volumes`` are the amounts offered per price level (best price
+        first) in the asset that is being filled and ``counter_volumes``
+        the corresponding amounts in the other asset.
+
+        Returns two numpy arrays: the amounts of the other asset that are
+        paid/received for each size (``nan`` if the book is not deep
+        enough) and the number of price levels consumed.
+    """
+    from numpy import asarray, concatenate, cumsum, interp, searchsorted, where, nan
+
+    cum_volumes = concatenate([[0.0], cumsum(volumes)])
+    cum_counter = concatenate([[0.0], cumsum(counter_volumes)])
+    sizes = asarray(sizes, dtype=float)
+    filled = interp(sizes, cum_volumes, cum_counter)
+    filled = where(sizes > cum_volumes[-1], nan, filled)
+    levels = searchsorted(cum_volumes, sizes, side="left")
+    return filled, levels
+
+
+@main.command()
+@click.pass_context
+@onlineChain
+@click.argument("market", nargs=1)
+@click.argument("side", type=click.Choice(["buy", "sell"]))
+@click.argument("amount", type=float)
+@click.option("--steps", type=int, default=10, help="Number of order sizes")
+@click.option("--limit", type=int, default=100, help="Depth of the orderbook")
+def simulate(ctx, market, side, amount, steps, limit):
+    """ Simulate the market impact of buying/selling quote
+
+        The orderbook is fetched once and orders of up to AMOUNT (quote)
+        are filled against it locally in ``--steps`` increments.
+    """
+    from numpy import array, isnan, linspace, minimum
+
+    market = Market(market, bitshares_instance=ctx.bitshares)
+    orderbook = market.orderbook(limit=limit)
+    orders = orderbook["asks"] if side == "buy" else orderbook["bids"]
+    if not orders:
+        print_message("The orderbook is empty", "warning")
+        return
+
+    prices = array([float(o["price"]) for o in orders])
+    sizes = linspace(amount / steps, amount, steps)
+    filled, levels = walk_orderbook(
+        [float(o["quote"]) for o in orders], [float(o["base"]) for o in orders], sizes
+    )
+    average = filled / sizes
+    worst = prices[minimum(levels, len(prices)) - 1]
+    if side == "buy":
+        slippage = (average / prices[0] - 1) * 100
+    else:
+        slippage = (1 - average / prices[0]) * 100
+
+    quote = market["quote"]
+    base = market["base"]
+    t = [["quote", "base", "average price", "worst price", "levels", "slippage"]]
+    for i, size in enumerate(sizes):
+        row = ["{:.{prec}f} {}".format(size, quote["symbol"], prec=quote["precision"])]
+        if isnan(filled[i]):
+            row.extend(["insufficient depth", "", "", len(prices), ""])
+        else:
+            row.extend(
+                [
+                    "{:.{prec}f} {}".format(
+                        filled[i], base["symbol"], prec=base["precision"]
+                    ),
+                    "{:f} {}/{}".format(average[i], base["symbol"], quote["symbol"]),
+                    "{:f} {}/{}".format(worst[i], base["symbol"], quote["symbol"]),
+                    levels[i],
+                    "{:.2f}%".format(slippage[i]),
+                ]
+            )
+        t.append(row)
+    print_table(t)
+
+
+#: Record layout of orderbook archives (side is 1 for bids, -1 for asks)
+ORDERBOOK_DTYPE = [
+    ("time", "<u4"),
+    ("market", "<u2"),
+    ("side", "i1"),
+    ("level", "<u2"),
+    ("price", "<f8"),
+    ("quote", "<f8"),
+]
+
+
+@main.command("record-books")
+@click.pass_context
+@onlineChain
+@click.argument("markets", nargs=-1, required=True)
+@click.option("--archive", default="orderbooks.bin", help="Archive to append to")
+@click.option("--interval", type=float, default=60, help="Seconds between snapshots")
+@click.option("--limit", type=int, default=50, help="Depth of the orderbooks")
+@click.option("--count", type=int, default=0, help="Number of snapshots (0: forever)")
+def record_books(ctx, markets, archive, interval, limit, count):
+    """ Record orderbook snapshots into an archive
+
+        Every ``--interval`` seconds, the orderbooks of all MARKETS are
+        appended to a compact binary archive (25 bytes per price level).
+        The archive can be replayed with :class:`uptick.archive.Archive`,
+        the index of each market is stored in its ``markets`` metadata.
+    """
+    from .archive import Archive
+
+    archive = Archive(archive, ORDERBOOK_DTYPE)
+    names = archive.metadata.setdefault("markets", [])
+    markets = [Market(market, bitshares_instance=ctx.bitshares) for market in markets]
+    indices = []
+    for market in markets:
+        name = "{}:{}".format(market["quote"]["symbol"], market["base"]["symbol"])
+        if name not in names:
+            names.append(name)
+        indices.append(names.index(name))
+    archive.save_metadata()
+
+    snapshots = 0
+    while not count or snapshots < count:
+        start = time.time()
+        records = []
+        for index, market in zip(indices, markets):
+            orderbook = ctx.bitshares.rpc.get_order_book(
+                market["base"]["id"], market["quote"]["id"], limit
+            )
+            for side, orders in [(1, orderbook["bids"]), (-1, orderbook["asks"])]:
+                records.extend(
+                    (
+                        int(start),
+                        index,
+                        side,
+                        level,
+                        float(order["price"]),
+                        float(order["quote"]),
+                    )
+                    for level, order in enumerate(orders)
+                )
+        archive.append(records)
+        snapshots += 1
+        log.info("Recorded {} price levels".format(len(records)))
+        if not count or snapshots < count:
+            time.sleep(max(0, interval - (time.time() - start)))
+
+
 @main.command()
 @click.pass_context
 @onlineChain
@@ -192,43 +347,257 @@ def sell(ctx, sell_amount, sell_asset, price, buy_asset, order_expiration, accou
 @main.command()
 @click.pass_context
 @onlineChain
-@click.argument("account", type=str)
-def openorders(ctx, account):
-    """ List open orders of an account
+@click.argument("accounts", type=str, nargs=-1)
+@click.option("--jsonl", is_flag=True, help="Stream orders as JSON lines")
+def openorders(ctx, accounts, jsonl):
+    """ List open orders of one or multiple accounts
     """
-    account = Account(
-        account or config["default_account"], bitshares_instance=ctx.bitshares
+    accounts = accounts or [config["default_account"]]
+    full_accounts = ctx.bitshares.rpc.get_full_accounts(accounts, False)
+    orders = [
+        (name, order)
+        for name, full_account in full_accounts
+        for order in full_account["limit_orders"]
+    ]
+    assets = get_assets(
+        ctx,
+        set(
+            order["sell_price"][side]["asset_id"]
+            for _, order in orders
+            for side in ["base", "quote"]
+        ),
     )
-    t = [["Price", "Quote", "Base", "ID"]]
-    for o in account.openorders:
+
+    t = [["Account", "Price", "Quote", "Base", "ID"]]
+    for name, order in orders:
+        base = assets[order["sell_price"]["base"]["asset_id"]]
+        quote = assets[order["sell_price"]["quote"]["asset_id"]]
+        # The price is derived from the integer amounts of the sell price
+        # and applied to the amount that is still for sale
+        price = (
+            int(order["sell_price"]["base"]["amount"])
+            / int(order["sell_price"]["quote"]["amount"])
+            * 10 ** (quote["precision"] - base["precision"])
+        )
+        for_sale = int(order["for_sale"]) / 10 ** base["precision"]
+        to_receive = for_sale / price
+        if jsonl:
+            click.echo(
+                json.dumps(
+                    dict(
+                        account=name,
+                        id=order["id"],
+                        price=price,
+                        base=base["symbol"],
+                        quote=quote["symbol"],
+                        for_sale=for_sale,
+                        to_receive=to_receive,
+                        expiration=order["expiration"],
+                    )
+                )
+            )
+            continue
         t.append(
             [
-                "{:f} {}/{}".format(
-                    o["price"],
-                    o["base"]["asset"]["symbol"],
-                    o["quote"]["asset"]["symbol"],
+                name,
+                "{:f} {}/{}".format(price, base["symbol"], quote["symbol"]),
+                "{:,.{prec}f} {}".format(
+                    to_receive, quote["symbol"], prec=quote["precision"]
+                ),
+                "{:,.{prec}f} {}".format(
+                    for_sale, base["symbol"], prec=base["precision"]
                 ),
-                str(o["quote"]),
-                str(o["base"]),
-                o["id"],
+                order["id"],
             ]
         )
-    print_table(t)
+    if not jsonl:
+        print_table(t)
+    truncated = [
+        name
+        for name, full_account in full_accounts
+        if full_account.get("more_data_available", {}).get("limit_orders")
+    ]
+    if truncated:
+        print_message(
+            "Not all orders of {} are shown, the node limits the number "
+            "of orders per account".format(", ".join(truncated)),
+            "error",
+        )
+        sys.exit(1)
+
+
+#: Orders requested per ``get_account_limit_orders`` call
+ORDERS_PER_CALL = 100
+
+
+def account_limit_orders(ctx, account, asset_a, asset_b):
+    """ All open orders of an account in a market (both directions),
+        paging through ``get_account_limit_orders``
+    """
+    rpc = ctx.bitshares.rpc
+    orders = []
+    for base, quote in [(asset_a, asset_b), (asset_b, asset_a)]:
+        page = rpc.get_account_limit_orders(account, base, quote, ORDERS_PER_CALL)
+        while page:
+            orders.extend(page)
+            if len(page) < ORDERS_PER_CALL:
+                break
+            last = page[-1]
+            page = rpc.get_account_limit_orders(
+                account, base, quote, ORDERS_PER_CALL, last["id"], last["sell_price"]
+            )
+    return orders
 
 
 @main.command()
-@click.option("--account", default=None)
-@click.argument("market")
+@click.option(
+    "--account",
+    multiple=True,
+    help="Account whose orders to cancel (can be given multiple times)",
+)
+@click.option("--all-markets", is_flag=True, help="Cancel orders in all markets")
+@click.option("--max-ops", type=int, help="Maximum number of cancels per transaction")
+@click.argument("markets", nargs=-1)
 @click.pass_context
 @online
 @unlock
-def cancelall(ctx, market, account):
-    """ Cancel all orders of an account in a market
+def cancelall(ctx, markets, account, all_markets, max_ops):
+    """ Cancel all orders of accounts in one or multiple markets
+
+        Markets are given as quote:base pairs (e.g. USD:BTS). The open
+        orders of all accounts are obtained in a single call and the
+        cancellations are broadcast in as many transactions as the
+        maximum transaction size of the chain requires.
+
+        Accounts with more orders than the node returns at once are
+        paged per market (or, with --all-markets, fetched again after
+        each round of cancellations). The command fails if orders are
+        left over.
+    """
+    from bitsharesbase import operations
+
+    if not markets and not all_markets:
+        print_message("Please provide a market or use --all-markets", "warning")
+        sys.exit(1)
+    accounts = account or [ctx.bitshares.config["default_account"]]
+
+    pairs = [re.split("[:/]", market.upper()) for market in markets]
+    for market, pair in zip(markets, pairs):
+        if len(pair) != 2 or pair[0] == pair[1]:
+            print_message(
+                "Invalid market {} (expected QUOTE:BASE)".format(market), "warning"
+            )
+            sys.exit(1)
+    symbols = sorted(set(symbol for pair in pairs for symbol in pair))
+    assets = dict(zip(symbols, ctx.bitshares.rpc.lookup_asset_symbols(symbols)))
+    for symbol, asset in assets.items():
+        if not asset:
+            print_message("Unknown asset {}".format(symbol), "warning")
+            sys.exit(1)
+    pairs = [frozenset(assets[symbol]["id"] for symbol in pair) for pair in pairs]
+
+    txs = []
+    cancelled = set()
+    pending = list(accounts)
+    while pending:
+        truncated, round_txs = [], []
+        for name, full_account in ctx.bitshares.rpc.get_full_accounts(pending, False):
+            more = full_account.get("more_data_available", {}).get("limit_orders")
+            if more and not all_markets:
+                # Only the first page of orders is known, obtain all orders
+                # of the given markets instead
+                orders = [
+                    order
+                    for pair in pairs
+                    for order in account_limit_orders(
+                        ctx, full_account["account"]["id"], *sorted(pair)
+                    )
+                ]
+            else:
+                orders = full_account["limit_orders"]
+                if more:
+                    truncated.append(name)
+            ops = []
+            for order in orders:
+                sell_price = order["sell_price"]
+                pair = frozenset(
+                    [sell_price["base"]["asset_id"], sell_price["quote"]["asset_id"]]
+                )
+                if order["id"] in cancelled:
+                    continue
+                if not all_markets and pair not in pairs:
+                    continue
+                cancelled.add(order["id"])
+                ops.append(
+                    operations.Limit_order_cancel(
+                        **{
+                            "fee": {"amount": 0, "asset_id": "1.3.0"},
+                            "fee_paying_account": full_account["account"]["id"],
+                            "order": order["id"],
+                            "extensions": [],
+                        }
+                    )
+                )
+            if not ops:
+                if name not in truncated:
+                    print_message("No open orders for {}".format(name), "info")
+                continue
+            round_txs.extend(
+                broadcast_operations(
+                    ctx,
+                    ops,
+                    full_account["account"]["name"],
+                    max_ops=max_ops,
+                    wait=False,
+                )
+            )
+        wait_for_transactions(ctx, round_txs)
+        txs.extend(round_txs)
+        # Accounts with more orders than get_full_accounts returns are
+        # fetched again once the cancellations of this round are confirmed
+        if truncated and (not round_txs or ctx.bitshares.nobroadcast):
+            for tx in txs:
+                print_tx(tx)
+            print_message(
+                "Not all orders of {} could be cancelled".format(", ".join(truncated)),
+                "error",
+            )
+            sys.exit(1)
+        pending = truncated
+    for tx in txs:
+        print_tx(tx)
+
+
+def ladder(side, min, max, num, total, spacing="linear", weighting="flat", ratio=2.0):
+    """ Compute prices and (quote) amounts of an order ladder
+
+        Prices are spaced linearly or geometrically between ``min`` and
+        ``max``. The ``total`` amount is split evenly (``flat``) or with
+        order sizes growing ``linear``-ly or ``geometric``-ally away from
+        the market, so that the order furthest from the market is
+        ``ratio`` times as large as the closest one.
+
+        Returns two numpy arrays (prices, amounts) sorted by price.
     """
-    market = Market(market)
-    ctx.bitshares.bundle = True
-    market.cancel([x["id"] for x in market.accountopenorders(account)], account=account)
-    print_tx(ctx.bitshares.txbuffer.broadcast())
+    from numpy import linspace, geomspace, ones
+
+    low, high = sorted([min, max])
+    if spacing == "geometric":
+        prices = geomspace(low, high, num)
+    else:
+        prices = linspace(low, high, num)
+
+    if weighting == "linear":
+        weights = linspace(1.0, ratio, num)
+    elif weighting == "geometric":
+        weights = geomspace(1.0, ratio, num)
+    else:
+        weights = ones(num)
+    # Buy orders are closest to the market at the highest price
+    if side == "buy":
+        weights = weights[::-1]
+
+    return prices, total * weights / weights.sum()
 
 
 @main.command()
@@ -237,13 +606,46 @@ def cancelall(ctx, market, account):
 @click.argument("side", type=click.Choice(["buy", "sell"]))
 @click.argument("min", type=float)
 @click.argument("max", type=float)
-@click.argument("num", type=float)
+@click.argument("num", type=int)
 @click.argument("total", type=float)
-@click.option("--order-expiration", default=None)
+@click.option("--order-expiration", default=None, type=int)
+@click.option(
+    "--spacing",
+    type=click.Choice(["linear", "geometric"]),
+    default="linear",
+    help="Spacing of the order prices",
+)
+@click.option(
+    "--weighting",
+    type=click.Choice(["flat", "linear", "geometric"]),
+    default="flat",
+    help="Distribution of the total amount over the orders",
+)
+@click.option(
+    "--ratio",
+    type=float,
+    default=2.0,
+    help="Size of the order furthest from the market relative to the closest one",
+)
+@click.option("--max-ops", type=int, help="Maximum number of orders per transaction")
 @click.pass_context
 @online
 @unlock
-def spread(ctx, market, side, min, max, num, total, order_expiration, account):
+def spread(
+    ctx,
+    market,
+    side,
+    min,
+    max,
+    num,
+    total,
+    order_expiration,
+    spacing,
+    weighting,
+    ratio,
+    max_ops,
+    account,
+):
     """ Place multiple orders
 
         \b
@@ -255,22 +657,63 @@ def spread(ctx, market, side, min, max, num, total, order_expiration, account):
         :param float total: Total amount of quote to use for all orders
         :param int order_expiration: Number of seconds until the order expires from the books
 
+        Orders are split into as many transactions as the maximum
+        transaction size of the chain requires.
     """
-    from tqdm import tqdm
-    from numpy import linspace
+    from numpy import rint
+    from bitshares.utils import formatTimeFromNow
+    from bitsharesbase import operations
 
-    market = Market(market)
-    ctx.bitshares.bundle = True
+    market = Market(market, bitshares_instance=ctx.bitshares)
+    account = Account(
+        account or ctx.bitshares.config["default_account"],
+        bitshares_instance=ctx.bitshares,
+    )
+    expiration = formatTimeFromNow(
+        order_expiration or ctx.bitshares.config["order-expiration"]
+    )
+    prices, amounts = ladder(side, min, max, num, total, spacing, weighting, ratio)
+    quote_amounts = rint(amounts * 10 ** market["quote"]["precision"]).astype(int)
+    base_amounts = rint(amounts * prices * 10 ** market["base"]["precision"]).astype(
+        int
+    )
 
-    if min < max:
-        space = linspace(min, max, num)
+    quote = market["quote"]["id"]
+    base = market["base"]["id"]
+    if side == "buy":
+        sell_asset, receive_asset = base, quote
+        sell_amounts, receive_amounts = base_amounts, quote_amounts
     else:
-        space = linspace(max, min, num)
-
-    func = getattr(market, side)
-    for p in tqdm(space):
-        func(p, total / float(num), account=account, expiration=order_expiration)
-    print_tx(ctx.bitshares.txbuffer.broadcast())
+        sell_asset, receive_asset = quote, base
+        sell_amounts, receive_amounts = quote_amounts, base_amounts
+
+    # The chain rejects orders of zero amounts (and with them the whole
+    # transaction)
+    empty = (sell_amounts <= 0) | (receive_amounts <= 0)
+    if empty.any():
+        print_message(
+            "{} of {} orders round to a zero amount, "
+            "use fewer orders or a larger total".format(empty.sum(), len(empty)),
+            "warning",
+        )
+        sys.exit(1)
+
+    ops = [
+        operations.Limit_order_create(
+            **{
+                "fee": {"amount": 0, "asset_id": "1.3.0"},
+                "seller": account["id"],
+                "amount_to_sell": {"amount": int(sell), "asset_id": sell_asset},
+                "min_to_receive": {"amount": int(receive), "asset_id": receive_asset},
+                "expiration": expiration,
+                "fill_or_kill": False,
+                "extensions": [],
+            }
+        )
+        for sell, receive in zip(sell_amounts, receive_amounts)
+    ]
+    for tx in broadcast_operations(ctx, ops, account["name"], max_ops=max_ops):
+        print_tx(tx)
 
 
 @main.command()
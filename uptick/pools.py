@@ -1,11 +1,267 @@
+import os
+import json
+import time
 import click
-from bitshares.account import Account
 from bitshares.amount import Amount
 from bitshares.asset import Asset
 from bitshares.price import Price
 from .decorators import online, unlock
 from .main import main, config
-from .ui import print_tx, format_tx, print_table, print_message
+from .ui import print_tx, format_tx, print_table, print_message, highlight, detail
+from .batch import get_objects
+
+#: Assets (a, b, share) of the pools loaded so far, indexed by pool id
+_pool_assets = dict()
+
+#: Maximum number of pools returned by a single ``list_liquidity_pools`` call
+POOLS_PER_CALL = 101
+
+
+def dynamic_data_id(asset_id):
+    """ Id of the dynamic data object (2.3.x) of an asset (1.3.x)
+    """
+    return "2.3." + asset_id.split(".")[2]
+
+
+def market_fee(amounts, asset, maker=True):
+    """ Market fees charged by ``asset`` on (numpy arrays of) ``amounts``
+
+        Takers pay the taker fee percent if the asset defines one.
+    """
+    from numpy import asarray, minimum
+
+    amounts = asarray(amounts, dtype=float)
+    options = asset["options"]
+    if not int(options["flags"]) & 0x01:  # charge_market_fee
+        return amounts * 0
+    percent = int(options["market_fee_percent"])
+    extensions = options.get("extensions") or {}
+    if not maker and isinstance(extensions, dict):
+        percent = int(extensions.get("taker_fee_percent", percent))
+    cap = int(options["max_market_fee"]) / 10 ** asset.precision
+    return minimum(amounts * percent / 10000, cap)
+
+
+class Pool:
+    """ Snapshot of a liquidity pool
+
+        The pool object, its assets and the dynamic data of its share
+        asset are obtained with batched ``get_objects`` calls. Assets are
+        static and cached for all pools, so that :meth:`refresh` only
+        needs a single call once a pool has been loaded.
+
+        The owner (issuer of the share asset) is only loaded with
+        ``with_owner``. It is then requested in the same batch as the
+        pool object.
+
+        :param str pool: Pool id (``1.19.x``) or share asset symbol/id
+        :param bool with_owner: Also obtain the owner account
+    """
+
+    __slots__ = [
+        "blockchain",
+        "id",
+        "asset_a",
+        "asset_b",
+        "share_asset",
+        "balance_a",
+        "balance_b",
+        "virtual_value",
+        "share_supply",
+        "taker_fee",
+        "withdrawal_fee",
+        "owner",
+        "data",
+    ]
+
+    def __init__(self, pool, blockchain_instance, with_owner=False):
+        self.blockchain = blockchain_instance
+        self.id = blockchain_instance._find_liquidity_pool(pool)
+        self.owner = None
+        self.refresh(with_owner)
+
+    @classmethod
+    def from_objects(cls, data, dynamic, assets, blockchain_instance):
+        """ Create a snapshot from already obtained objects
+
+            :param dict data: The pool object
+            :param dict dynamic: Dynamic data of the share asset
+            :param list assets: Objects of asset a, asset b and the share
+                asset
+        """
+        pool = cls.__new__(cls)
+        pool.blockchain = blockchain_instance
+        pool.id = data["id"]
+        pool.owner = None
+        _pool_assets[pool.id] = tuple(
+            Asset(asset, blockchain_instance=blockchain_instance) for asset in assets
+        )
+        pool.asset_a, pool.asset_b, pool.share_asset = _pool_assets[pool.id]
+        pool.update(data)
+        pool.update_dynamic(dynamic)
+        return pool
+
+    def refresh(self, with_owner=False):
+        """ Obtain the current state of the pool (and its owner)
+        """
+        rpc = self.blockchain.rpc
+        if self.id in _pool_assets:
+            share_asset = _pool_assets[self.id][2]
+            ids = [self.id, dynamic_data_id(share_asset["id"])]
+            if with_owner:
+                ids.append(share_asset["issuer"])
+            data, dynamic, *owner = rpc.get_objects(ids)
+            if owner:
+                self.owner = owner[0]
+        else:
+            data = rpc.get_objects([self.id])[0]
+            if not data:
+                raise ValueError("Could not retrieve pool object {}".format(self.id))
+            *assets, dynamic = rpc.get_objects(
+                [
+                    data["asset_a"],
+                    data["asset_b"],
+                    data["share_asset"],
+                    dynamic_data_id(data["share_asset"]),
+                ]
+            )
+            _pool_assets[self.id] = tuple(
+                Asset(asset, blockchain_instance=self.blockchain) for asset in assets
+            )
+            if with_owner:
+                [self.owner] = rpc.get_objects([_pool_assets[self.id][2]["issuer"]])
+        self.asset_a, self.asset_b, self.share_asset = _pool_assets[self.id]
+        self.update(data)
+        self.update_dynamic(dynamic)
+
+    def update(self, data):
+        """ Update the balances from a (changed) pool object
+        """
+        self.data = data
+        self.balance_a = self._amount(data["balance_a"], self.asset_a)
+        self.balance_b = self._amount(data["balance_b"], self.asset_b)
+        self.virtual_value = int(data["virtual_value"])
+        self.taker_fee = int(data["taker_fee_percent"]) / 100
+        self.withdrawal_fee = int(data["withdrawal_fee_percent"]) / 100
+
+    def update_dynamic(self, dynamic):
+        """ Update the share supply from the share asset's dynamic data
+        """
+        self.share_supply = self._amount(dynamic["current_supply"], self.share_asset)
+
+    def _amount(self, amount, asset):
+        return Amount(
+            int(amount) / 10 ** asset.precision,
+            asset,
+            blockchain_instance=self.blockchain,
+        )
+
+    @property
+    def invariant(self):
+        """ Pool invariant k = xy
+        """
+        return self.virtual_value / 10 ** (
+            self.asset_a.precision + self.asset_b.precision
+        )
+
+    def exchange(self, amounts, sell_a=True):
+        """ Amounts received when selling (numpy arrays of) ``amounts`` of
+            asset A (or B) into the pool
+
+            Accounts for the taker fee of the pool as well as the market
+            fees of the sold (maker) and the received (taker) asset.
+        """
+        if sell_a:
+            sold, bought = self.asset_a, self.asset_b
+            balance_in, balance_out = float(self.balance_a), float(self.balance_b)
+        else:
+            sold, bought = self.asset_b, self.asset_a
+            balance_in, balance_out = float(self.balance_b), float(self.balance_a)
+        pool_receives = amounts - market_fee(amounts, sold, maker=True)
+        pool_pays = balance_out * pool_receives / (balance_in + pool_receives)
+        pool_pays = pool_pays * (1 - self.taker_fee / 100)
+        return pool_pays - market_fee(pool_pays, bought, maker=False)
+
+    def amount(self, amount, symbol):
+        """ Amount of one of the pool's assets (given as symbol or id)
+        """
+        for asset in [self.asset_a, self.asset_b, self.share_asset]:
+            if symbol in [asset["symbol"], asset["id"]]:
+                return Amount(amount, asset, blockchain_instance=self.blockchain)
+        raise ValueError("{} is not an asset of pool {}".format(symbol, self.id))
+
+
+def load_pools(ctx, ttl=60):
+    """ Load all liquidity pools
+
+        Pools are enumerated with ``list_liquidity_pools`` and all their
+        assets and share asset supplies are obtained with batched
+        ``get_objects`` calls. The raw objects are cached on disk for
+        ``ttl`` seconds.
+
+        Returns a list of :class:`Pool` and a dictionary of all loaded
+        assets indexed by id.
+    """
+    cache = os.path.join(
+        click.get_app_dir("uptick"),
+        "pools-{}.json".format(ctx.bitshares.rpc.chain_params["chain_id"][:8]),
+    )
+    if ttl and os.path.exists(cache) and time.time() - os.path.getmtime(cache) < ttl:
+        with open(cache) as fid:
+            pools, objects = json.load(fid)
+    else:
+        pools = []
+        start = None
+        while True:
+            page = ctx.bitshares.rpc.list_liquidity_pools(POOLS_PER_CALL, start)
+            pools.extend(page)
+            if len(page) < POOLS_PER_CALL:
+                break
+            start = "1.19.{}".format(int(page[-1]["id"].split(".")[2]) + 1)
+        ids = set(["1.3.0"])
+        for data in pools:
+            ids.update([data["asset_a"], data["asset_b"], data["share_asset"]])
+            ids.add(dynamic_data_id(data["share_asset"]))
+        objects = {obj["id"]: obj for obj in get_objects(ctx, sorted(ids)) if obj}
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(cache, "w") as fid:
+            json.dump([pools, objects], fid)
+
+    pools = [
+        Pool.from_objects(
+            data,
+            objects[dynamic_data_id(data["share_asset"])],
+            [objects[data[key]] for key in ["asset_a", "asset_b", "share_asset"]],
+            blockchain_instance=ctx.bitshares,
+        )
+        for data in pools
+    ]
+    assets = {
+        id: Asset(obj, blockchain_instance=ctx.bitshares)
+        for id, obj in objects.items()
+        if id.startswith("1.3.")
+    }
+    return pools, assets
+
+
+def core_values(pools):
+    """ Value of each pool's assets in the core asset
+
+        Assets are valued at the price of the deepest pool that pairs
+        them with the core asset.
+    """
+    values = {"1.3.0": (1.0, float("inf"))}
+    for pool in pools:
+        for asset, balance, other in [
+            (pool.asset_a, pool.balance_a, pool.balance_b),
+            (pool.asset_b, pool.balance_b, pool.balance_a),
+        ]:
+            if other["asset"]["id"] != "1.3.0" or not float(balance):
+                continue
+            depth = float(other)
+            if depth > values.get(asset["id"], (0, 0))[1]:
+                values[asset["id"]] = (depth / float(balance), depth)
+    return {id: value for id, (value, _) in values.items()}
 
 
 @main.group()
@@ -125,11 +381,12 @@ def deposit(ctx, pool, amount_a, symbol_a, amount_b, symbol_b, account):
     to withdraw from the pool at a later date.
 
     """
+    pool = Pool(pool, blockchain_instance=ctx.bitshares)
     ctx.blockchain.blocking = True
     tx = ctx.blockchain.deposit_into_liquidity_pool(
-        pool,
-        amount_a=Amount(amount_a, symbol_a, blockchain_instance=ctx.bitshares),
-        amount_b=Amount(amount_b, symbol_b, blockchain_instance=ctx.bitshares),
+        pool.id,
+        amount_a=pool.amount(amount_a, symbol_a),
+        amount_b=pool.amount(amount_b, symbol_b),
         account=account,
     )
     tx.pop("trx", None)
@@ -167,10 +424,11 @@ def withdraw(ctx, pool, amount, symbol, account):
     if you identified the pool by its share asset instead of by its pool id.)
 
     """
+    pool = Pool(pool, blockchain_instance=ctx.bitshares)
     ctx.blockchain.blocking = True
     tx = ctx.blockchain.withdraw_from_liquidity_pool(
-        pool,
-        share_amount=Amount(amount, symbol, blockchain_instance=ctx.bitshares),
+        pool.id,
+        share_amount=pool.amount(amount, symbol),
         account=account,
     )
     tx.pop("trx", None)
@@ -207,11 +465,12 @@ def exchange(ctx, pool, sell_amount, sell_symbol, buy_amount, buy_symbol, accoun
     the operation will fail.
 
     """
+    pool = Pool(pool, blockchain_instance=ctx.bitshares)
     ctx.blockchain.blocking = True
     tx = ctx.blockchain.exchange_with_liquidity_pool(
-        pool,
-        amount_to_sell=Amount(sell_amount, sell_symbol, blockchain_instance=ctx.bitshares),
-        min_to_receive=Amount(buy_amount, buy_symbol, blockchain_instance=ctx.bitshares),
+        pool.id,
+        amount_to_sell=pool.amount(sell_amount, sell_symbol),
+        min_to_receive=pool.amount(buy_amount, buy_symbol),
         account=account,
     )
     tx.pop("trx", None)
@@ -259,7 +518,6 @@ def describe(ctx, pool, slip, slip_buy, verbose):
     option.  (The formula is buy_pct = sell_pct/(100% - sell_pct).)
 
     """
-    # Quite messy, and desires a proper Pool object class.  T.B.D. Someday.
     slip_pcts = [0.01, 0.05, 0.10]
     if slip:
         slip_pcts.append(float(slip)/100)
@@ -268,83 +526,322 @@ def describe(ctx, pool, slip, slip_buy, verbose):
         pct=float(slip_buy)/100
         slip_pcts.append(pct/(1-pct))
         slip_pcts.sort()
-    pool_id = ctx.bitshares._find_liquidity_pool(pool) # ad hoc
-    data = ctx.bitshares.rpc.get_object(pool_id)
-    if data:
-        t = [["Key", "Value"]]
-        try:
-            orig_data = data
-            asset_a = Asset(data.pop("asset_a"), blockchain_instance=ctx.bitshares)
-            asset_b = Asset(data.pop("asset_b"), blockchain_instance=ctx.bitshares)
-            share_asset = Asset(data.pop("share_asset"), blockchain_instance=ctx.bitshares)
-            pool_owner = Account(share_asset["issuer"], blockchain_instance=ctx.bitshares)
-            share_dyn = ctx.bitshares.rpc.get_object(share_asset["dynamic_asset_data_id"])
-            share_supply = int(share_dyn["current_supply"])
-            share_supply = Amount(share_supply/10**share_asset.precision, share_asset)
-            amount_a = Amount(int(data.pop("balance_a"))/10**asset_a.precision, asset_a)
-            amount_b = Amount(int(data.pop("balance_b"))/10**asset_b.precision, asset_b)
-            pool_k = int(data.pop("virtual_value"))/10**(asset_a.precision + asset_b.precision)
-            taker_fee = int(data.pop("taker_fee_percent"))/100
-            withdrawal_fee = int(data.pop("withdrawal_fee_percent"))/100
-            data.pop("id")
-            if verbose:
-                pool_desc = share_asset["options"]["description"]
-                if "description" in share_asset:
-                    pool_desc = share_asset["description"]
-                if isinstance(pool_desc, dict):
-                    pool_desc = format_tx(pool_desc)
-            # Generate Table:
-            t.append(["Pool Name", "%s"%(share_asset["symbol"])])
-            if verbose:
-                t.append(["Pool Description", pool_desc])
-            t.append(["Pool Id", "%s"%(pool_id)])
-            t.append(["Pool Owner", "%s (%s)"%(pool_owner["name"],pool_owner["id"])])
-            t.append(["Asset A", "%s (%s)"%(asset_a["symbol"],asset_a["id"])])
-            t.append(["Asset B", "%s (%s)"%(asset_b["symbol"],asset_b["id"])])
-            t.append(["",""])
-            t.append(["Balance of Asset A", str(amount_a)])
-            t.append(["Balance of Asset B", str(amount_b)])
-            t.append(["",""])
-            t.append(["Outstanding Pool Shares", "%s (%s)"%(str(share_supply),share_asset["id"])])
-            t.append(["Pool Invariant (k=xy)", pool_k])
-            t.append(["",""])
-            t.append(["Nominal Pool Price (A/B)", Price(base=amount_a, quote=amount_b, blockchain_instance=ctx.bitshares)])
-            t.append(["Nominal Pool Price (B/A)", Price(base=amount_b, quote=amount_a, blockchain_instance=ctx.bitshares)])
-            t.append(["",""])
-            t.append(["Price Resilience:",""])
-            def recv(pct):
-                return (pct/(1+pct))*((100.0-taker_fee)/100)
-            t.append(["",""])
-            t.append(["  Selling Asset A:",""])
-            t.append(["",""])
-            for sl in slip_pcts:
-                t.append([
-                    "   %4g%% Slippage"%(sl*100),
-                    "Sell %s for %s"%(amount_a*sl, amount_b*recv(sl))
-                ])
-            t.append(["",""])
-            t.append(["  Selling Asset B:",""])
-            t.append(["",""])
-            for sl in slip_pcts:
-                t.append([
-                    "   %4g%% Slippage"%(sl*100),
-                    "Sell %s for %s"%(amount_b*sl, amount_a*recv(sl))
-                ])
-            t.append(["",""])
-            t.append(["  (est. with fees)",""])
-            t.append(["",""])
-            t.append(["Exchange Fee", "%0.2f%%"%taker_fee])
-            t.append(["Withdrawal Fee", "%0.2f%%"%withdrawal_fee])
-        except:
-            raise
-            t = [["Key", "Value"]]
-            data = orig_data
-            pass # If schema not what we expected, reset and fall through to sorted list.
-        for key in sorted(data):
-            value=data[key]
-            if isinstance(value, dict) or isinstance(value, list):
-                value = format_tx(value)
-            t.append([key, value])
-        print_table(t)
-    else:
+    try:
+        pool = Pool(pool, blockchain_instance=ctx.bitshares, with_owner=True)
+    except ValueError:
         print_message("Could not retrieve pool object", "warning")
+        return
+    share_asset = pool.share_asset
+    pool_owner = pool.owner
+    amount_a = pool.balance_a
+    amount_b = pool.balance_b
+    taker_fee = pool.taker_fee
+    if verbose:
+        pool_desc = share_asset["options"]["description"]
+        if "description" in share_asset:
+            pool_desc = share_asset["description"]
+        if isinstance(pool_desc, dict):
+            pool_desc = format_tx(pool_desc)
+    # Generate Table:
+    t = [["Key", "Value"]]
+    t.append(["Pool Name", "%s"%(share_asset["symbol"])])
+    if verbose:
+        t.append(["Pool Description", pool_desc])
+    t.append(["Pool Id", "%s"%(pool.id)])
+    t.append(["Pool Owner", "%s (%s)"%(pool_owner["name"],pool_owner["id"])])
+    t.append(["Asset A", "%s (%s)"%(pool.asset_a["symbol"],pool.asset_a["id"])])
+    t.append(["Asset B", "%s (%s)"%(pool.asset_b["symbol"],pool.asset_b["id"])])
+    t.append(["",""])
+    t.append(["Balance of Asset A", str(amount_a)])
+    t.append(["Balance of Asset B", str(amount_b)])
+    t.append(["",""])
+    t.append(["Outstanding Pool Shares", "%s (%s)"%(str(pool.share_supply),share_asset["id"])])
+    t.append(["Pool Invariant (k=xy)", pool.invariant])
+    t.append(["",""])
+    t.append(["Nominal Pool Price (A/B)", Price(base=amount_a, quote=amount_b, blockchain_instance=ctx.bitshares)])
+    t.append(["Nominal Pool Price (B/A)", Price(base=amount_b, quote=amount_a, blockchain_instance=ctx.bitshares)])
+    t.append(["",""])
+    t.append(["Price Resilience:",""])
+    def recv(pct):
+        return (pct/(1+pct))*((100.0-taker_fee)/100)
+    t.append(["",""])
+    t.append(["  Selling Asset A:",""])
+    t.append(["",""])
+    for sl in slip_pcts:
+        t.append([
+            "   %4g%% Slippage"%(sl*100),
+            "Sell %s for %s"%(amount_a*sl, amount_b*recv(sl))
+        ])
+    t.append(["",""])
+    t.append(["  Selling Asset B:",""])
+    t.append(["",""])
+    for sl in slip_pcts:
+        t.append([
+            "   %4g%% Slippage"%(sl*100),
+            "Sell %s for %s"%(amount_b*sl, amount_a*recv(sl))
+        ])
+    t.append(["",""])
+    t.append(["  (est. with fees)",""])
+    t.append(["",""])
+    t.append(["Exchange Fee", "%0.2f%%"%taker_fee])
+    t.append(["Withdrawal Fee", "%0.2f%%"%pool.withdrawal_fee])
+    known = [
+        "id",
+        "asset_a",
+        "asset_b",
+        "share_asset",
+        "balance_a",
+        "balance_b",
+        "virtual_value",
+        "taker_fee_percent",
+        "withdrawal_fee_percent",
+    ]
+    for key in sorted(pool.data):
+        if key in known:
+            continue
+        value=pool.data[key]
+        if isinstance(value, dict) or isinstance(value, list):
+            value = format_tx(value)
+        t.append([key, value])
+    print_table(t)
+
+
+@pool.command()
+@click.argument("pool")
+@click.option("--points", type=int, default=20, help="Number of trade sizes to show")
+@click.option(
+    "--max-pct", type=float, default=50.0,
+    help="Largest trade size in percent of the pool's balance"
+)
+@click.option(
+    "--slippage", type=float, multiple=True,
+    help="Show the largest trade size for this slippage percent"
+)
+@click.option("--csv/--table", help="Show output as csv or table", default=False)
+@click.pass_context
+@online
+def curve(ctx, pool, points, max_pct, slippage, csv):
+    """Compute the price-impact curve of a Liquidity Pool.
+
+    Evaluates the constant-product exchange in both directions for trade
+    sizes of up to MAX_PCT percent of the sold asset's pool balance.
+    Estimates include the taker fee of the pool and the market fees of
+    both assets. Slippage is relative to the nominal pool price.
+
+    POOL: The pool to evaluate. This can be given as a pool id (e.g.
+    "1.19.x") or as the share asset symbol (or asset id) of the pool's
+    share asset.
+
+    With --slippage, the largest trade that stays within the given
+    slippage is computed from a dense grid of trade sizes.
+
+    """
+    import sys
+    import csv as csvlib
+    from numpy import geomspace, linspace, maximum, searchsorted
+
+    pool = Pool(pool, blockchain_instance=ctx.bitshares)
+    directions = [
+        (True, pool.asset_a, pool.asset_b, pool.balance_a, pool.balance_b),
+        (False, pool.asset_b, pool.asset_a, pool.balance_b, pool.balance_a),
+    ]
+
+    def evaluate(sell_a, balance_in, balance_out, fractions):
+        sizes = fractions * float(balance_in)
+        received = pool.exchange(sizes, sell_a)
+        nominal = float(balance_out) / float(balance_in)
+        return sizes, received, (1 - received / (sizes * nominal)) * 100
+
+    rows = [["sell", "receive", "price", "slippage"]]
+    fractions = linspace(0, max_pct / 100, points + 1)[1:]
+    for sell_a, sold, bought, balance_in, balance_out in directions:
+        sizes, received, slippages = evaluate(
+            sell_a, balance_in, balance_out, fractions
+        )
+        for size, recv, slip in zip(sizes, received, slippages):
+            rows.append([
+                "{:.{prec}f} {}".format(size, sold["symbol"], prec=sold["precision"]),
+                "{:.{prec}f} {}".format(
+                    recv, bought["symbol"], prec=bought["precision"]
+                ),
+                "{:f} {}/{}".format(recv / size, bought["symbol"], sold["symbol"]),
+                "{:.4f}%".format(slip),
+            ])
+
+    if slippage:
+        targets = sorted(slippage)
+        limits = [["slippage"] + [
+            "max sell {}".format(sold["symbol"]) for _, sold, _, _, _ in directions
+        ]]
+        dense = geomspace(1e-8, 100, 100000)
+        columns = []
+        for sell_a, sold, bought, balance_in, balance_out in directions:
+            sizes, received, slippages = evaluate(
+                sell_a, balance_in, balance_out, dense
+            )
+            # Largest size whose slippage (and that of all smaller sizes)
+            # stays within the target
+            index = searchsorted(maximum.accumulate(slippages), targets, side="right")
+            columns.append([
+                "{:.{prec}f}".format(sizes[i - 1], prec=sold["precision"])
+                if i else "-"
+                for i in index
+            ])
+        for target, *sizes in zip(targets, *columns):
+            limits.append(["{:g}%".format(target)] + sizes)
+
+    if csv:
+        writer = csvlib.writer(sys.stdout)
+        writer.writerows(rows)
+        if slippage:
+            writer.writerows(limits)
+    else:
+        print_table(rows)
+        if slippage:
+            print_table(limits)
+
+
+@pool.command(name="list")
+@click.option("--asset", multiple=True, help="Only show pools containing this asset")
+@click.option("--min-tvl", type=float, help="Minimum total value locked (in core)")
+@click.option("--max-fee", type=float, help="Maximum exchange fee in percent")
+@click.option(
+    "--sort", type=click.Choice(["id", "name", "tvl", "fee"]), default="id",
+    help="Sort pools by this column"
+)
+@click.option("--ttl", type=int, default=60, help="Seconds to reuse cached pools")
+@click.pass_context
+@online
+def list_pools(ctx, asset, min_tvl, max_fee, sort, ttl):
+    """List all Liquidity Pools.
+
+    The total value locked (TVL) is given in the core asset. Assets are
+    valued at the price of the deepest pool that pairs them with the core
+    asset; pools without such a price have no TVL.
+
+    """
+    pools, assets = load_pools(ctx, ttl=ttl)
+    values = core_values(pools)
+    core = assets["1.3.0"]
+
+    def tvl(pool):
+        a = values.get(pool.asset_a["id"])
+        b = values.get(pool.asset_b["id"])
+        if a is None and b is None:
+            return None
+        if a is None:
+            return 2 * float(pool.balance_b) * b
+        if b is None:
+            return 2 * float(pool.balance_a) * a
+        return float(pool.balance_a) * a + float(pool.balance_b) * b
+
+    symbols = set(symbol.upper() for symbol in asset)
+    rows = []
+    for p in pools:
+        value = tvl(p)
+        if not symbols.issubset(
+            [p.asset_a["symbol"], p.asset_b["symbol"], p.asset_a["id"], p.asset_b["id"]]
+        ):
+            continue
+        if min_tvl is not None and (value is None or value < min_tvl):
+            continue
+        if max_fee is not None and p.taker_fee > max_fee:
+            continue
+        rows.append((p, value))
+
+    keys = {
+        "id": lambda x: int(x[0].id.split(".")[2]),
+        "name": lambda x: x[0].share_asset["symbol"],
+        "tvl": lambda x: -(x[1] or 0),
+        "fee": lambda x: x[0].taker_fee,
+    }
+    t = [["id", "name", "asset a", "asset b", "balance a", "balance b", "tvl", "fee"]]
+    for p, value in sorted(rows, key=keys[sort]):
+        t.append([
+            p.id,
+            p.share_asset["symbol"],
+            p.asset_a["symbol"],
+            p.asset_b["symbol"],
+            str(p.balance_a),
+            str(p.balance_b),
+            "-" if value is None else "{:,.{prec}f} {}".format(
+                value, core["symbol"], prec=core["precision"]
+            ),
+            "%0.2f%%" % p.taker_fee,
+        ])
+    print_table(t)
+
+
+@pool.command()
+@click.argument("pools", nargs=-1, required=True)
+@click.pass_context
+@online
+def watch(ctx, pools):
+    """Watch Liquidity Pools for changes.
+
+    Subscribes to the pool objects and the dynamic data of their share
+    assets and prints changes of the balances, the price and the pool
+    invariant as they happen. The state of the pools is maintained
+    locally from the notifications.
+
+    POOLS: The pools to watch, given as pool ids (e.g. "1.19.x") or share
+    asset symbols (or asset ids).
+
+    """
+    from datetime import datetime
+    from bitshares.notify import Notify
+
+    watched = dict()
+    for name in pools:
+        p = Pool(name, blockchain_instance=ctx.bitshares)
+        watched[p.id] = p
+        watched[dynamic_data_id(p.share_asset["id"])] = p
+
+    def delta(new, old, precision):
+        return "{:.{prec}f} ({:+.{prec}f})".format(new, new - old, prec=precision)
+
+    def on_object(data):
+        p = watched.get(data.get("id"))
+        if p is None:
+            return
+        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        if data["id"] == p.id:
+            a, b, k = float(p.balance_a), float(p.balance_b), p.invariant
+            p.update(data)
+            price = a / b if b else 0
+            b_new = float(p.balance_b)
+            new_price = float(p.balance_a) / b_new if b_new else 0
+            click.echo(
+                "{} {} {}: {}, {}: {}, price: {:f} ({:+.4f}%), k: {}".format(
+                    now,
+                    highlight(p.share_asset["symbol"]),
+                    p.asset_a["symbol"],
+                    detail(delta(float(p.balance_a), a, p.asset_a.precision)),
+                    p.asset_b["symbol"],
+                    detail(delta(float(p.balance_b), b, p.asset_b.precision)),
+                    new_price,
+                    (new_price / price - 1) * 100 if price else 0,
+                    delta(p.invariant, k, 0),
+                )
+            )
+        else:
+            supply = float(p.share_supply)
+            p.update_dynamic(data)
+            click.echo(
+                "{} {} shares: {}".format(
+                    now,
+                    highlight(p.share_asset["symbol"]),
+                    detail(
+                        delta(float(p.share_supply), supply, p.share_asset.precision)
+                    ),
+                )
+            )
+
+    notify = Notify(
+        accounts=[],
+        markets=[],
+        objects=list(watched.keys()),
+        on_object=on_object,
+        blockchain_instance=ctx.bitshares,
+    )
+    notify.listen()
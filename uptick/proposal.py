@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
+import re
 import json
 import click
-from tqdm import tqdm
-from bitshares.proposal import Proposals
+import datetime
 from bitshares.account import Account
+from .batch import get_objects, get_assets, get_key_references, broadcast_operations
 from .decorators import onlineChain, unlockWallet
 from .main import main, config
-from .ui import print_table, print_tx, format_dict, pprintOperation
+from .ui import (
+    print_table,
+    print_tx,
+    print_message,
+    format_operation,
+    resolve_names,
+)
+
+OBJECT_ID = re.compile(r"^1\.\d+\.\d+$")
 
 
 @main.command()
@@ -43,14 +52,52 @@ def approveproposal(ctx, proposal, account):
     print_tx(ctx.bitshares.approveproposal(proposal, account=account))
 
 
+def collect_ids(data, prefix):
+    """ Collect all object ids with the given ``prefix`` (e.g. ``1.2.``)
+        that are referenced in (nested) operation data
+    """
+    ids = set()
+    if isinstance(data, dict):
+        data = list(data.values())
+    if isinstance(data, (list, tuple)):
+        for x in data:
+            ids.update(collect_ids(x, prefix))
+    elif isinstance(data, str) and OBJECT_ID.match(data) and data.startswith(prefix):
+        ids.add(data)
+    return ids
+
+
+def load_proposals(ctx, account):
+    """ Obtain the proposals of an account together with all accounts and
+        assets they refer to
+
+        Returns (proposals, accounts, assets) with accounts and assets
+        as dictionaries indexed by id.
+    """
+    account = Account(account, blockchain_instance=ctx.bitshares)
+    proposals = ctx.bitshares.rpc.get_proposed_transactions(account["id"])
+    account_ids = collect_ids(proposals, "1.2.")
+    asset_ids = collect_ids(proposals, "1.3.")
+    accounts = {a["id"]: a for a in get_objects(ctx, sorted(account_ids)) if a}
+    assets = get_assets(ctx, asset_ids)
+    return proposals, accounts, assets
+
+
 @main.command()
 @click.pass_context
 @onlineChain
 @click.argument("account", default=config["default_account"], type=str, required=False)
-def proposals(ctx, account):
+@click.option("--json", "as_json", is_flag=True, help="Stream proposals as JSON lines")
+def proposals(ctx, account, as_json):
     """ List proposals
     """
-    proposals = Proposals(account)
+    proposals, accounts, assets = load_proposals(ctx, account)
+
+    def name(account_id):
+        if account_id in accounts:
+            return accounts[account_id]["name"]
+        return account_id
+
     t = [
         [
             "id",
@@ -62,33 +109,199 @@ def proposals(ctx, account):
             "proposal",
         ]
     ]
-    for proposal in tqdm(proposals):
+    for proposal in proposals:
         ops = proposal["proposed_transaction"]["operations"]
-        opsList = list()
-        for op in tqdm(ops):
-            opsList.append(pprintOperation(op))
-
+        required = [
+            name(x)
+            for x in (
+                proposal["required_active_approvals"]
+                + proposal["required_owner_approvals"]
+            )
+        ]
+        available = (
+            [name(x) for x in proposal["available_active_approvals"]]
+            + proposal["available_key_approvals"]
+            + [name(x) for x in proposal["available_owner_approvals"]]
+        )
+        if as_json:
+            click.echo(
+                json.dumps(
+                    dict(
+                        id=proposal["id"],
+                        expiration=proposal["expiration_time"],
+                        proposer=name(proposal["proposer"]),
+                        required_approvals=required,
+                        available_approvals=available,
+                        review_period_time=proposal.get("review_period_time"),
+                        operations=[
+                            [op[0], resolve_names(op[1], accounts, assets)]
+                            for op in ops
+                        ],
+                    )
+                )
+            )
+            continue
         t.append(
             [
                 proposal["id"],
                 proposal["expiration_time"],
-                Account(proposal.proposer)["name"],
-                [
-                    Account(x)["name"]
-                    for x in (
-                        proposal["required_active_approvals"]
-                        + proposal["required_owner_approvals"]
-                    )
-                ],
-                json.dumps(
-                    [Account(x)["name"] for x in proposal["available_active_approvals"]]
-                    + proposal["available_key_approvals"]
-                    + proposal["available_owner_approvals"],
-                    indent=1,
-                ),
+                name(proposal["proposer"]),
+                required,
+                json.dumps(available, indent=1),
                 proposal.get("review_period_time", None),
-                "\n".join(opsList),
+                "\n".join(format_operation(op, accounts, assets) for op in ops),
             ]
         )
 
-    print_table(t)
+    if not as_json:
+        print_table(t)
+
+
+def can_sign(account, permission, pubkeys):
+    """ Whether the keys in ``pubkeys`` alone satisfy the threshold of
+        an account's permission
+    """
+    authority = account[permission]
+    weight = sum(int(w) for key, w in authority["key_auths"] if key in pubkeys)
+    return weight >= int(authority["weight_threshold"])
+
+
+def missing_approvals(proposal, accounts, signers, disapprove=False):
+    """ Compute which of the ``signers`` (set of account ids) could still
+        approve (or disapprove) a proposal
+
+        An account is a candidate if it is one of the required accounts
+        or directly listed in their account authorities. Returns a list
+        of (account id, permission).
+    """
+    result = []
+    for permission in ["active", "owner"]:
+        candidates = set()
+        for required in proposal["required_{}_approvals".format(permission)]:
+            candidates.add(required)
+            if required in accounts:
+                candidates.update(
+                    x[0] for x in accounts[required][permission]["account_auths"]
+                )
+        available = set(proposal["available_{}_approvals".format(permission)])
+        if disapprove:
+            approvers = candidates & signers & available
+        else:
+            approvers = (candidates & signers) - available
+        result.extend((x, permission) for x in sorted(approvers))
+    return result
+
+
+@main.command()
+@click.pass_context
+@onlineChain
+@click.argument("account", default=config["default_account"], type=str, required=False)
+@click.option("--proposer", multiple=True, help="Only proposals of this proposer")
+@click.option(
+    "--type", multiple=True, help="Only proposals containing this operation type"
+)
+@click.option(
+    "--expires-within", type=float, help="Only proposals expiring within hours"
+)
+@click.option("--disapprove", is_flag=True, help="Remove approvals instead")
+@click.option("--max-ops", type=int, help="Maximum number of operations per tx")
+@unlockWallet
+def approveproposals(ctx, account, proposer, type, expires_within, disapprove, max_ops):
+    """ Approve (or disapprove) many proposals at once
+
+        The accounts controlled by the wallet are compared with the
+        required and available approvals of all (filtered) proposals of
+        ACCOUNT. Only the approvals that are actually missing (or
+        present, with --disapprove) are changed, packed into as few
+        transactions as possible per signing account. Approvals the
+        wallet holds too few keys for are skipped before anything is
+        broadcast.
+    """
+    from bitsharesbase import operations
+
+    proposals, accounts, _ = load_proposals(ctx, account)
+    if proposer:
+        ids = set(
+            a["id"] for a in ctx.bitshares.rpc.lookup_account_names(list(proposer)) if a
+        )
+        proposals = [p for p in proposals if p["proposer"] in ids]
+    if type:
+        from bitsharesbase.operationids import operations as operation_ids
+
+        unknown = [t for t in type if t not in operation_ids]
+        if unknown:
+            print_message("Unknown operation type {}".format(unknown[0]), "warning")
+            return
+        op_ids = set(operation_ids[t] for t in type)
+        proposals = [
+            p
+            for p in proposals
+            if any(
+                op[0] in op_ids for op in p["proposed_transaction"]["operations"]
+            )
+        ]
+    if expires_within is not None:
+        deadline = (
+            datetime.datetime.utcnow() + datetime.timedelta(hours=expires_within)
+        ).strftime("%Y-%m-%dT%H:%M:%S")
+        proposals = [p for p in proposals if p["expiration_time"] <= deadline]
+
+    pubkeys = set(ctx.bitshares.wallet.getPublicKeys(True))
+    signers = set(
+        id for ids in get_key_references(ctx, pubkeys).values() for id in ids
+    )
+    # Account authorities of required accounts may not have been
+    # referenced in the proposal data
+    accounts.update(
+        {a["id"]: a for a in get_objects(ctx, sorted(signers - set(accounts))) if a}
+    )
+
+    ops = dict()
+    t = [["proposal", "account", "permission", "action"]]
+    for proposal in proposals:
+        for approver, permission in missing_approvals(
+            proposal, accounts, signers, disapprove
+        ):
+            if not can_sign(accounts[approver], permission, pubkeys):
+                t.append(
+                    [
+                        proposal["id"],
+                        accounts[approver]["name"],
+                        permission,
+                        "skipped (missing keys)",
+                    ]
+                )
+                continue
+            key = "{}_approvals_to_{}".format(
+                permission, "remove" if disapprove else "add"
+            )
+            ops.setdefault((approver, permission), []).append(
+                operations.Proposal_update(
+                    **{
+                        "fee": {"amount": 0, "asset_id": "1.3.0"},
+                        "fee_paying_account": approver,
+                        "proposal": proposal["id"],
+                        key: [approver],
+                        "prefix": ctx.bitshares.prefix,
+                    }
+                )
+            )
+            t.append(
+                [
+                    proposal["id"],
+                    accounts[approver]["name"],
+                    permission,
+                    "disapprove" if disapprove else "approve",
+                ]
+            )
+    if len(t) > 1:
+        print_table(t)
+    if not ops:
+        print_message("Nothing to approve", "warning")
+        return
+
+    for (approver, permission), account_ops in ops.items():
+        for tx in broadcast_operations(
+            ctx, account_ops, accounts[approver]["name"], permission, max_ops=max_ops
+        ):
+            print_tx(tx)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+import math
+import click
+import itertools
+from bitshares.market import Market
+from bitshares.account import Account
+from .decorators import online, unlock_wallet
+from .main import main, config
+from .markets import walk_orderbook
+from .pools import load_pools
+from .ui import print_table, print_tx, print_message
+
+
+class PoolHop:
+    """ Exchange via a liquidity pool
+    """
+
+    def __init__(self, pool, sell_a):
+        self.pool = pool
+        self.sell_a = sell_a
+        if sell_a:
+            self.sold, self.bought = pool.asset_a, pool.asset_b
+        else:
+            self.sold, self.bought = pool.asset_b, pool.asset_a
+
+    def __str__(self):
+        return "pool {}".format(self.pool.id)
+
+    def receive(self, amount):
+        return float(self.pool.exchange([amount], self.sell_a)[0])
+
+    def minimum(self, amount):
+        """ Amount an exchange of ``amount`` is guaranteed to receive
+        """
+        return self.receive(amount)
+
+    def operation(self, account, amount_to_sell, min_to_receive):
+        from bitsharesbase import operations
+
+        return operations.Liquidity_pool_exchange(
+            **{
+                "fee": {"amount": 0, "asset_id": "1.3.0"},
+                "account": account["id"],
+                "pool": self.pool.id,
+                "amount_to_sell": amount_to_sell,
+                "min_to_receive": min_to_receive,
+                "extensions": [],
+            }
+        )
+
+
+class BookHop:
+    """ Exchange via (fill-or-kill) limit order against an orderbook side
+    """
+
+    def __init__(self, sold, bought, orders, sell_quote):
+        self.sold, self.bought = sold, bought
+        quote = [float(o["quote"]) for o in orders]
+        base = [float(o["base"]) for o in orders]
+        if sell_quote:
+            self.volumes, self.counter_volumes = quote, base
+        else:
+            self.volumes, self.counter_volumes = base, quote
+
+    def __str__(self):
+        return "orderbook"
+
+    def receive(self, amount):
+        received, _ = walk_orderbook(self.volumes, self.counter_volumes, [amount])
+        return float(received[0])
+
+    def minimum(self, amount):
+        """ Amount a fill-or-kill order of ``amount`` has to ask for to be
+            matched by all levels it consumes, i.e. priced at the worst
+            level rather than the average fill
+        """
+        _, [levels] = walk_orderbook(self.volumes, self.counter_volumes, [amount])
+        if not levels or levels > len(self.volumes):
+            return float("nan")
+        worst = levels - 1
+        return amount * self.counter_volumes[worst] / self.volumes[worst]
+
+    def operation(self, account, amount_to_sell, min_to_receive):
+        from bitshares.utils import formatTimeFromNow
+        from bitsharesbase import operations
+
+        return operations.Limit_order_create(
+            **{
+                "fee": {"amount": 0, "asset_id": "1.3.0"},
+                "seller": account["id"],
+                "amount_to_sell": amount_to_sell,
+                "min_to_receive": min_to_receive,
+                "expiration": formatTimeFromNow(60),
+                "fill_or_kill": True,
+                "extensions": [],
+            }
+        )
+
+
+def find_routes(hops, sell, buy, amount, max_hops):
+    """ Evaluate all paths of at most ``max_hops`` hops (that do not visit
+        an asset twice) from asset ``sell`` to asset ``buy``
+
+        Returns a list of (received amount, path) sorted best first.
+    """
+    edges = dict()
+    for hop in hops:
+        edges.setdefault(hop.sold["id"], []).append(hop)
+
+    routes = []
+
+    def search(asset, amount, path, visited):
+        for hop in edges.get(asset, []):
+            target = hop.bought["id"]
+            if target in visited:
+                continue
+            received = hop.receive(amount)
+            if math.isnan(received) or received <= 0:
+                continue
+            if target == buy:
+                routes.append((received, path + [hop]))
+            elif len(path) + 1 < max_hops:
+                search(target, received, path + [hop], visited | {target})
+
+    search(sell, amount, [], {sell})
+    return sorted(routes, key=lambda x: x[0], reverse=True)
+
+
+@main.command()
+@click.argument("sell_amount", type=float)
+@click.argument("sell_asset")
+@click.argument("buy_asset")
+@click.option(
+    "--via",
+    multiple=True,
+    help="Asset whose orderbooks may be used (defaults to the core asset)",
+)
+@click.option("--max-hops", type=int, default=3, help="Maximum number of hops")
+@click.option("--limit", type=int, default=100, help="Depth of the orderbooks")
+@click.option("--top", type=int, default=5, help="Number of routes to show")
+@click.option("--ttl", type=int, default=60, help="Seconds to reuse cached pools")
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.5,
+    help="Accepted shortfall per hop in percent (with --execute)",
+)
+@click.option("--execute", is_flag=True, help="Exchange along the best route")
+@click.option(
+    "--account",
+    default=config["default_account"],
+    type=str,
+    help="Account to use for this action",
+)
+@click.pass_context
+@online
+def route(
+    ctx,
+    sell_amount,
+    sell_asset,
+    buy_asset,
+    via,
+    max_hops,
+    limit,
+    top,
+    ttl,
+    tolerance,
+    execute,
+    account,
+):
+    """ Find the best route to exchange assets
+
+        All liquidity pools and the orderbooks between SELL_ASSET,
+        BUY_ASSET and the --via assets are loaded once and all paths
+        (pool to pool, pool to orderbook, ...) are evaluated locally.
+
+        With --execute, the exchanges of the best route are placed in a
+        single transaction. Orderbook hops are placed as fill-or-kill
+        orders priced at the worst level they consume, every hop sells
+        the minimum amount received from the previous hop and --tolerance
+        is applied on top of that.
+    """
+    pools, assets = load_pools(ctx, ttl=ttl)
+    symbols = [sell_asset, buy_asset] + list(via or ["1.3.0"])
+    resolved = ctx.bitshares.rpc.lookup_asset_symbols(
+        [symbol.upper() for symbol in symbols]
+    )
+    for symbol, asset in zip(symbols, resolved):
+        if not asset:
+            print_message("Unknown asset {}".format(symbol), "warning")
+            return
+    sell, buy = resolved[0], resolved[1]
+    books = {asset["id"]: asset for asset in resolved}
+
+    hops = []
+    for pool in pools:
+        hops.extend([PoolHop(pool, True), PoolHop(pool, False)])
+    for quote, base in itertools.combinations(books.values(), 2):
+        market = Market(
+            "{}:{}".format(quote["symbol"], base["symbol"]),
+            bitshares_instance=ctx.bitshares,
+        )
+        orderbook = market.orderbook(limit=limit)
+        hops.append(BookHop(quote, base, orderbook["bids"], sell_quote=True))
+        hops.append(BookHop(base, quote, orderbook["asks"], sell_quote=False))
+
+    routes = find_routes(hops, sell["id"], buy["id"], sell_amount, max_hops)
+    if not routes:
+        print_message("No route found", "warning")
+        return
+
+    t = [["#", "route", "receive", "price"]]
+    for i, (received, path) in enumerate(routes[:top]):
+        t.append(
+            [
+                i,
+                "\n".join(
+                    "{} -> {} ({})".format(
+                        hop.sold["symbol"], hop.bought["symbol"], hop
+                    )
+                    for hop in path
+                ),
+                "{:.{prec}f} {}".format(
+                    received, buy["symbol"], prec=buy["precision"]
+                ),
+                "{:f} {}/{}".format(
+                    received / sell_amount, buy["symbol"], sell["symbol"]
+                ),
+            ]
+        )
+    print_table(t)
+
+    if not execute:
+        return
+    if not ctx.obj.get("unsigned", False):
+        unlock_wallet(ctx)
+    account = Account(account, bitshares_instance=ctx.bitshares)
+    ops = []
+    amount = int(sell_amount * 10 ** sell["precision"])
+    for hop in routes[0][1]:
+        expected = hop.minimum(amount / 10 ** hop.sold["precision"])
+        minimum = int(
+            expected * (1 - tolerance / 100) * 10 ** hop.bought["precision"]
+        )
+        ops.append(
+            hop.operation(
+                account,
+                {"amount": amount, "asset_id": hop.sold["id"]},
+                {"amount": minimum, "asset_id": hop.bought["id"]},
+            )
+        )
+        amount = minimum
+    print_tx(ctx.bitshares.finalizeOp(ops, account["name"], "active"))
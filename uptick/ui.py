@@ -180,3 +180,68 @@ def pprintOperation(op, show_memo=False, ctx=None):
         )
     else:
         return format_dict(op)
+
+
+def format_amount(amount, assets):
+    """ Format an amount given as ``{"amount": .., "asset_id": ..}`` with
+        the prefetched ``assets`` (dictionary indexed by id)
+    """
+    asset = assets.get(amount["asset_id"])
+    if not asset:
+        return "{} {}".format(amount["amount"], amount["asset_id"])
+    return "{:.{prec}f} {}".format(
+        int(amount["amount"]) / 10 ** asset["precision"],
+        asset["symbol"],
+        prec=asset["precision"],
+    )
+
+
+def resolve_names(data, accounts, assets):
+    """ Replace account ids by names and amounts by formatted amounts in
+        (nested) operation data
+    """
+    if isinstance(data, dict):
+        if set(data) == {"amount", "asset_id"}:
+            return format_amount(data, assets)
+        return {k: resolve_names(v, accounts, assets) for k, v in data.items()}
+    elif isinstance(data, (list, tuple)):
+        return [resolve_names(x, accounts, assets) for x in data]
+    elif isinstance(data, str) and data in accounts:
+        return accounts[data]["name"]
+    return data
+
+
+def format_operation(op, accounts, assets):
+    """ Like :func:`pprintOperation` but without any API calls, all
+        accounts and assets are taken from the prefetched ``accounts``
+        and ``assets`` (dictionaries indexed by id)
+    """
+    id, op = op
+
+    def name(account_id):
+        if account_id in accounts:
+            return accounts[account_id]["name"]
+        return account_id
+
+    if id == 0:
+        return "Transfer from {} to {}: {}".format(
+            name(op["from"]), name(op["to"]), format_amount(op["amount"], assets)
+        )
+    elif id == 1:
+        return "{} sells {} for {}".format(
+            name(op["seller"]),
+            format_amount(op["amount_to_sell"], assets),
+            format_amount(op["min_to_receive"], assets),
+        )
+    elif id == 2:
+        return "Canceled order %s" % op["order"]
+    elif id == 5:
+        return "New account created for {}".format(op["name"])
+    elif id == 6:
+        return "Account {} updated".format(name(op["account"]))
+    elif id == 15:
+        return "Reserve {}".format(format_amount(op["amount_to_reserve"], assets))
+    elif id == 33:
+        return "Claiming from vesting: %s" % format_amount(op["amount"], assets)
+    else:
+        return format_dict(resolve_names(op, accounts, assets))
@@ -1,10 +1,12 @@
+import datetime
 import click
 from bitshares.account import Account
 from bitshares.amount import Amount
 from bitshares.vesting import Vesting
 from .decorators import online
 from .main import main, config
-from .ui import print_table
+from .ui import print_table, print_message
+from .batch import get_objects
 
 
 class Vote:
@@ -42,11 +44,18 @@ def votes(ctx, account, type):
         t = Vote.vote_type_from_id(vote["id"])
         ret[t].append(vote)
 
-    t = [["id", "url", "account"]]
-    for vote in ret["committee"]:
-        t.append(
-            [vote["id"], vote["url"], Account(vote["committee_member_account"])["name"]]
-        )
+    # Obtain all referenced accounts and vesting balances at once
+    ids = set()
+    for vote in account["votes"]:
+        for key in ["committee_member_account", "witness_account", "worker_account"]:
+            if key in vote:
+                ids.add(vote[key])
+        if vote.get("pay_vb"):
+            ids.add(vote["pay_vb"])
+    objects = {obj["id"]: obj for obj in get_objects(ctx, ids) if obj}
+
+    def name(id):
+        return objects[id]["name"] if id in objects else id
 
     if "committee" in type:
         t = [["id", "url", "account", "votes"]]
@@ -55,7 +64,7 @@ def votes(ctx, account, type):
                 [
                     vote["id"],
                     vote["url"],
-                    Account(vote["committee_member_account"])["name"],
+                    name(vote["committee_member_account"]),
                     str(Amount({"amount": vote["total_votes"], "asset_id": "1.3.0"})),
                 ]
             )
@@ -77,13 +86,17 @@ def votes(ctx, account, type):
             t.append(
                 [
                     vote["id"],
-                    Account(vote["witness_account"])["name"],
+                    name(vote["witness_account"]),
                     vote["url"],
                     str(Amount({"amount": vote["total_votes"], "asset_id": "1.3.0"})),
                     vote["last_confirmed_block_num"],
                     vote["total_missed"],
-                    str(Vesting(vote.get("pay_vb")).claimable)
-                    if vote.get("pay_vb")
+                    str(
+                        Vesting(
+                            objects[vote["pay_vb"]], bitshares_instance=ctx.bitshares
+                        ).claimable
+                    )
+                    if vote.get("pay_vb") in objects
                     else "",
                 ]
             )
@@ -101,7 +114,224 @@ def votes(ctx, account, type):
                     str(amount),
                     str(votes),
                     "{work_begin_date}\n-\n{work_end_date}".format(**vote),
-                    str(Account(vote["worker_account"])["name"]),
+                    name(vote["worker_account"]),
+                ]
+            )
+        print_table(t)
+
+
+def ranks(votes):
+    """ Rank (0 is best) of each entry of a numpy array of vote tallies
+    """
+    import numpy
+
+    order = numpy.argsort(-votes, kind="stable")
+    ranks = numpy.empty(len(votes), dtype=int)
+    ranks[order] = numpy.arange(len(votes))
+    return ranks
+
+
+def fund_workers(votes, daily_pay, budget):
+    """ Daily pay of each worker if the budget is distributed in the order
+        of the workers' votes
+    """
+    import numpy
+
+    order = numpy.argsort(-votes, kind="stable")
+    paid = numpy.zeros(len(votes), dtype=numpy.int64)
+    # What remains of the budget before each worker is paid
+    remaining = budget - numpy.concatenate([[0], numpy.cumsum(daily_pay[order])[:-1]])
+    paid[order] = numpy.clip(numpy.minimum(daily_pay[order], remaining), 0, None)
+    paid[votes <= 0] = 0
+    return paid
+
+
+@main.command()
+@click.option(
+    "--account",
+    default=config["default_account"],
+    help="Account whose votes are changed",
+)
+@click.option(
+    "--approve",
+    multiple=True,
+    help="Witness/committee member (account name) or worker (1.14.x) to approve",
+)
+@click.option(
+    "--disapprove",
+    multiple=True,
+    help="Witness/committee member (account name) or worker (1.14.x) to disapprove",
+)
+@click.option(
+    "--stake",
+    type=float,
+    help="Voting stake (defaults to the account's core balance, orders and vesting)",
+)
+@click.option(
+    "--budget", type=float, help="Daily worker budget (defaults to the chain maximum)"
+)
+@click.pass_context
+@online
+def simulatevotes(ctx, account, approve, disapprove, stake, budget):
+    """ Simulate the outcome of changing an account's votes
+
+        All witnesses, committee members and workers are loaded once and
+        the resulting active witnesses, committee members and funded
+        workers are computed locally, as if the account's stake was
+        moved according to --approve/--disapprove.
+
+        Names that are both a witness and a committee member have to be
+        prefixed with their type, e.g. ``witness:init0`` or
+        ``committee:init0``.
+
+        Stake proxied to the account is only included if given via
+        --stake.
+    """
+    import numpy
+
+    [[_, full_account]] = ctx.bitshares.rpc.get_full_accounts([account], False)
+    account = full_account["account"]
+    witness_accounts = ctx.bitshares.rpc.lookup_witness_accounts("", 1000)
+    committee_accounts = ctx.bitshares.rpc.lookup_committee_member_accounts("", 1000)
+    workers = ctx.bitshares.rpc.get_all_workers(False)
+    properties, core, *objects = get_objects(
+        ctx,
+        ["2.0.0", "1.3.0"]
+        + [id for _, id in witness_accounts]
+        + [id for _, id in committee_accounts],
+    )
+    witnesses = objects[: len(witness_accounts)]
+    committee = objects[len(witness_accounts) :]
+
+    if account["options"]["voting_account"] != "1.2.5":
+        print_message(
+            "{} votes through a proxy, its own votes are not counted".format(
+                account["name"]
+            ),
+            "warning",
+        )
+    if stake is None:
+        stake = int(full_account["statistics"]["total_core_in_orders"])
+        stake += sum(
+            int(balance["balance"])
+            for balance in full_account["balances"]
+            if balance["asset_type"] == "1.3.0"
+        )
+        stake += sum(
+            int(vesting["balance"]["amount"])
+            for vesting in full_account["vesting_balances"]
+            if vesting["balance"]["asset_id"] == "1.3.0"
+        )
+    else:
+        stake = int(stake * 10 ** core["precision"])
+    if budget is None:
+        budget = int(properties["parameters"]["worker_budget_per_day"])
+    else:
+        budget = int(budget * 10 ** core["precision"])
+
+    # Resolve the vote ids to add and remove, indexed by (type, name)
+    vote_ids = dict()
+    for (name, _), witness in zip(witness_accounts, witnesses):
+        vote_ids[(Vote.WITNESS, name)] = witness["vote_id"]
+    for (name, _), member in zip(committee_accounts, committee):
+        vote_ids[(Vote.COMMITTEE, name)] = member["vote_id"]
+    for worker in workers:
+        vote_ids[(Vote.WORKER, worker["id"])] = worker["vote_for"]
+    current = set(account["options"]["votes"])
+    votes = set(current)
+    for names, change in [(approve, votes.add), (disapprove, votes.discard)]:
+        for name in names:
+            if ":" in name:
+                kind, name = name.split(":", 1)
+                matches = [(kind, name)] if (kind, name) in vote_ids else []
+            else:
+                matches = [(k, name) for k in Vote.types() if (k, name) in vote_ids]
+            if not matches:
+                print_message(
+                    "Unknown witness, committee member or worker {}".format(name),
+                    "warning",
+                )
+                return
+            if len(matches) > 1:
+                print_message(
+                    "{} is ambiguous, use {}".format(
+                        name, " or ".join("{}:{}".format(k, n) for k, n in matches)
+                    ),
+                    "warning",
+                )
+                return
+            change(vote_ids[matches[0]])
+
+    def tally(vote_ids, totals):
+        before = numpy.array([int(x) for x in totals], dtype=numpy.int64)
+        was = numpy.isin(vote_ids, list(current))
+        now = numpy.isin(vote_ids, list(votes))
+        return before, before + stake * (now.astype(int) - was.astype(int))
+
+    def amount(value):
+        return "{:,.{prec}f} {}".format(
+            value / 10 ** core["precision"], core["symbol"], prec=core["precision"]
+        )
+
+    # Witnesses and committee members
+    status = {
+        (True, True): "active",
+        (True, False): "leaves",
+        (False, True): "enters",
+        (False, False): "inactive",
+    }
+    for title, accounts, items, count in [
+        (
+            "witness",
+            witness_accounts,
+            witnesses,
+            len(properties["active_witnesses"]),
+        ),
+        (
+            "committee member",
+            committee_accounts,
+            committee,
+            len(properties["active_committee_members"]),
+        ),
+    ]:
+        before, after = tally(
+            [item["vote_id"] for item in items],
+            [item["total_votes"] for item in items],
+        )
+        rank_before, rank_after = ranks(before), ranks(after)
+        active_before, active_after = rank_before < count, rank_after < count
+        t = [[title, "votes", "new votes", "rank", "new rank", "status"]]
+        for i in numpy.flatnonzero((before != after) | (active_before != active_after)):
+            t.append(
+                [
+                    accounts[i][0],
+                    amount(before[i]),
+                    amount(after[i]),
+                    rank_before[i] + 1,
+                    rank_after[i] + 1,
+                    status[(bool(active_before[i]), bool(active_after[i]))],
                 ]
             )
         print_table(t)
+
+    # Workers
+    now = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+    workers = [w for w in workers if w["work_begin_date"] <= now]
+    before, after = tally(
+        [w["vote_for"] for w in workers], [w["total_votes_for"] for w in workers]
+    )
+    daily_pay = numpy.array([int(w["daily_pay"]) for w in workers], dtype=numpy.int64)
+    paid_before = fund_workers(before, daily_pay, budget)
+    paid_after = fund_workers(after, daily_pay, budget)
+    t = [["worker", "votes", "new votes", "paid", "new paid"]]
+    for i in numpy.flatnonzero((before != after) | (paid_before != paid_after)):
+        t.append(
+            [
+                "{} ({})".format(workers[i]["name"], workers[i]["id"]),
+                amount(before[i]),
+                amount(after[i]),
+                amount(paid_before[i]),
+                amount(paid_after[i]),
+            ]
+        )
+    print_table(t)
@@ -1,9 +1,10 @@
 import click
-from tqdm import tqdm
+from collections import Counter
 from bitshares.account import Account
 from .decorators import onlineChain, offlineChain, unlockWallet
 from .main import main, config
 from .ui import print_table, print_message
+from .batch import get_objects, get_key_references
 
 
 @main.command()
@@ -39,15 +40,116 @@ def changewalletpassphrase(ctx, new_password):
     ctx.bitshares.wallet.changePassphrase(new_password)
 
 
+def encrypt_wif(args):
+    """ Encrypt a wif with the master key of the wallet (runs in a worker
+        process, hence the decrypted master key is handed to the workers)
+    """
+    from bitsharesbase.bip38 import encrypt
+    from bitsharesbase.account import PrivateKey
+
+    wif, masterkey, prefix = args
+    return format(encrypt(PrivateKey(wif, prefix=prefix), masterkey), "encwif")
+
+
+def store_keys(store, keys):
+    """ Store many (pubkey, encrypted wif) pairs of an encrypted SQLite
+        key store in a single transaction
+
+        The key store API commits every key on its own. This writes to the
+        store's table directly and is therefore coupled to the schema of
+        ``graphenestorage``'s ``SqliteEncryptedKeyStore`` (its
+        ``sqlite_file``, ``__tablename__``, ``__key__`` and ``__value__``).
+    """
+    import sqlite3
+
+    connection = sqlite3.connect(store.sqlite_file)
+    with connection:
+        connection.executemany(
+            "INSERT INTO {} ({}, {}) VALUES (?, ?)".format(
+                store.__tablename__, store.__key__, store.__value__
+            ),
+            keys,
+        )
+    connection.close()
+
+
+def import_keys(ctx, wifs):
+    """ Validate, encrypt (in parallel) and store many keys at once
+
+        Only wallets in an encrypted SQLite key store are written in bulk,
+        all other key stores are filled key by key via the wallet.
+
+        Returns the public keys that have been added.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from bitsharesbase.account import PrivateKey
+    from graphenestorage import SqliteEncryptedKeyStore
+
+    prefix = ctx.bitshares.prefix
+    existing = set(ctx.bitshares.wallet.getPublicKeys(False))
+    keys = dict()
+    for number, wif in enumerate(wifs, 1):
+        try:
+            pub = format(PrivateKey(wif, prefix=prefix).pubkey, prefix)
+        except Exception:
+            print_message("Invalid private key #{}".format(number), "warning")
+            continue
+        if pub not in existing:
+            keys[pub] = wif
+    if not keys:
+        return []
+
+    store = ctx.bitshares.wallet.store
+    if type(store) is not SqliteEncryptedKeyStore:
+        for wif in keys.values():
+            ctx.bitshares.wallet.addPrivateKey(wif)
+        return list(keys)
+
+    with ProcessPoolExecutor() as pool:
+        encrypted = list(
+            pool.map(
+                encrypt_wif,
+                [(wif, store.masterkey, prefix) for wif in keys.values()],
+                chunksize=64,
+            )
+        )
+    store_keys(store, list(zip(keys, encrypted)))
+    return list(keys)
+
+
 @main.command()
 @click.pass_context
 @onlineChain
 @click.argument("key", nargs=-1)
+@click.option(
+    "--file",
+    type=click.File("r"),
+    help="Import all keys of a file (one wif per line)",
+)
 @unlockWallet
-def addkey(ctx, key):
+def addkey(ctx, key, file):
     """ Add a private key to the wallet
     """
-    if not key:
+    if file:
+        wifs = list(key) + [
+            line.strip()
+            for line in file
+            if line.strip() and not line.strip().startswith("#")
+        ]
+        pubkeys = import_keys(ctx, wifs)
+        print_message("Added {} of {} keys".format(len(pubkeys), len(wifs)))
+        references = get_key_references(ctx, pubkeys)
+        counts = Counter(id for ids in references.values() for id in ids)
+        ids = sorted(counts)
+        names = {a["id"]: a["name"] for a in get_objects(ctx, ids) if a}
+        t = [["Account", "Keys"]]
+        for id in ids:
+            t.append([names.get(id, id), counts[id]])
+        print_table(t)
+        unused = sum(not ids for ids in references.values())
+        if unused:
+            print_message("{} keys are not used by any account".format(unused), "info")
+    elif not key:
         while True:
             key = click.prompt(
                 "Private Key (wif) [Enter to quit]",
@@ -131,19 +233,27 @@ def listaccounts(ctx):
     """ List accounts (for the connected network)
     """
     t = [["Name", "Key", "Owner", "Active", "Memo"]]
-    for key in tqdm(ctx.bitshares.wallet.getPublicKeys(True)):
-        for account in ctx.bitshares.wallet.getAccountsFromPublicKey(key):
-            account = Account(account)
-            is_owner = key in [x[0] for x in account["owner"]["key_auths"]]
-            is_active = key in [x[0] for x in account["active"]["key_auths"]]
-            is_memo = key == account["options"]["memo_key"]
-            t.append([
-                account["name"],
-                key,
-                "x" if is_owner else "",
-                "x" if is_active else "",
-                "x" if is_memo else "",
-            ])
+    references = get_key_references(ctx, ctx.bitshares.wallet.getPublicKeys(True))
+    ids = sorted(set(id for ids in references.values() for id in ids))
+    accounts = {account["id"]: account for account in get_objects(ctx, ids) if account}
+    owner_keys, active_keys = dict(), dict()
+    for account in accounts.values():
+        owner_keys[account["id"]] = set(x[0] for x in account["owner"]["key_auths"])
+        active_keys[account["id"]] = set(x[0] for x in account["active"]["key_auths"])
+    for key, ids in references.items():
+        for id in ids:
+            if id not in accounts:
+                continue
+            account = accounts[id]
+            t.append(
+                [
+                    account["name"],
+                    key,
+                    "x" if key in owner_keys[id] else "",
+                    "x" if key in active_keys[id] else "",
+                    "x" if key == account["options"]["memo_key"] else "",
+                ]
+            )
     print_table(t)
 
 
@@ -1,9 +1,14 @@
+import sys
+import json
 import click
+import urllib.request
+from datetime import datetime
 from prettytable import PrettyTable
 from bitshares.witness import Witnesses
 from .decorators import onlineChain, unlockWallet
 from .main import main, config
-from .ui import print_tx, print_table
+from .ui import print_tx, print_table, print_message
+from .batch import get_objects
 
 
 @main.command()
@@ -40,12 +45,136 @@ def disapprovewitness(ctx, witnesses, account):
     print_tx(ctx.bitshares.disapprovewitness(witnesses, account=account))
 
 
+def load_witnesses(ctx):
+    """ Load all witnesses with two batched calls
+
+        Returns the witness objects (with their account ``name`` and
+        ``weight``) and the global properties.
+    """
+    accounts = ctx.bitshares.rpc.lookup_witness_accounts("", 1000)
+    properties, witness_account, *witnesses = get_objects(
+        ctx, ["2.0.0", "1.2.1"] + [id for _, id in accounts]
+    )
+    threshold = witness_account["active"]["weight_threshold"]
+    weights = dict(witness_account["active"]["account_auths"])
+    for (name, _), witness in zip(accounts, witnesses):
+        witness["name"] = name
+        witness["weight"] = weights.get(witness["witness_account"], 0) / threshold
+    return witnesses, properties
+
+
+def follow_witnesses(ctx, witnesses, webhook=None, exit_on_miss=False):
+    """ Subscribe to witness objects and blocks and alert whenever a
+        witness misses blocks
+    """
+    from bitshares.notify import Notify
+
+    watched = {witness["id"]: witness for witness in witnesses}
+    head = dict(block_num=0)
+
+    def alert(witness, missed):
+        message = "{} missed {} block(s) (total: {}, last confirmed: {})".format(
+            witness["name"],
+            missed,
+            witness["total_missed"],
+            witness["last_confirmed_block_num"],
+        )
+        print_message(
+            "{} {}".format(datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), message),
+            "error",
+        )
+        if webhook:
+            request = urllib.request.Request(
+                webhook,
+                data=json.dumps(
+                    dict(
+                        witness=witness["name"],
+                        missed=missed,
+                        total_missed=witness["total_missed"],
+                        last_confirmed_block_num=witness["last_confirmed_block_num"],
+                        head_block_num=head["block_num"],
+                        message=message,
+                    )
+                ).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            try:
+                urllib.request.urlopen(request, timeout=10)
+            except Exception as e:
+                print_message("Webhook failed: {}".format(e), "warning")
+        if exit_on_miss:
+            sys.exit(1)
+
+    def on_object(data):
+        witness = watched.get(data.get("id"))
+        if witness is None:
+            return
+        missed = int(data["total_missed"]) - int(witness["total_missed"])
+        witness["total_missed"] = data["total_missed"]
+        witness["last_confirmed_block_num"] = data["last_confirmed_block_num"]
+        if missed > 0:
+            alert(witness, missed)
+
+    def on_block(block_id):
+        head["block_num"] = int(block_id[:8], 16)
+
+    print_message("Following {} witnesses".format(len(watched)), "info")
+    notify = Notify(
+        accounts=[],
+        markets=[],
+        objects=list(watched.keys()),
+        on_object=on_object,
+        on_block=on_block,
+        blockchain_instance=ctx.bitshares,
+    )
+    notify.listen()
+
+
 @main.command()
 @click.pass_context
 @onlineChain
-def witnesses(ctx):
+@click.option(
+    "--sort",
+    type=click.Choice(["weight", "votes", "missed", "name", "id"]),
+    default="weight",
+    help="Sort witnesses by this column",
+)
+@click.option("--active-only", is_flag=True, help="Only list active witnesses")
+@click.option("--follow", is_flag=True, help="Keep watching for missed blocks")
+@click.option(
+    "--watch",
+    multiple=True,
+    help="Witness to follow (defaults to all active witnesses)",
+)
+@click.option("--webhook", help="URL to POST missed block alerts to (with --follow)")
+@click.option(
+    "--exit-on-miss", is_flag=True, help="Exit with code 1 on a missed block"
+)
+def witnesses(ctx, sort, active_only, follow, watch, webhook, exit_on_miss):
     """ List witnesses and relevant information
+
+        With --follow, the witnesses are subscribed to and an alert is
+        raised whenever a followed witness misses blocks.
     """
+    witnesses, properties = load_witnesses(ctx)
+    if active_only:
+        active = set(properties["active_witnesses"])
+        witnesses = [w for w in witnesses if w["id"] in active]
+    if follow:
+        if watch:
+            witnesses = [w for w in witnesses if w["name"] in watch]
+        else:
+            active = set(properties["active_witnesses"])
+            witnesses = [w for w in witnesses if w["id"] in active]
+        follow_witnesses(ctx, witnesses, webhook, exit_on_miss)
+        return
+    keys = {
+        "weight": lambda w: -w["weight"],
+        "votes": lambda w: -int(w["total_votes"]),
+        "missed": lambda w: -int(w["total_missed"]),
+        "name": lambda w: w["name"],
+        "id": lambda w: int(w["id"].split(".")[2]),
+    }
     t = [
         [
             "weight",
@@ -57,12 +186,11 @@ def witnesses(ctx):
             "last_confirmed_block_num",
         ]
     ]
-    for witness in sorted(Witnesses(), key=lambda x: x.weight, reverse=True):
-        witness.refresh()
+    for witness in sorted(witnesses, key=keys[sort]):
         t.append(
             [
-                "{:.2f}%".format(witness.weight * 100),
-                witness.account["name"],
+                "{:.2f}%".format(witness["weight"] * 100),
+                witness["name"],
                 witness["signing_key"],
                 witness["vote_id"],
                 witness["url"],
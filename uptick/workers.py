@@ -2,12 +2,12 @@
 import json
 import click
 import datetime
-from bitshares.worker import Workers
 from bitshares.account import Account
 from bitshares.amount import Amount
 from .decorators import onlineChain, unlockWallet
 from .main import main, config
 from .ui import print_table, print_tx
+from .batch import get_objects
 
 
 @main.command()
@@ -50,7 +50,8 @@ def disapproveworker(ctx, workers, account):
 @click.argument("account", default=None, required=False)
 @click.option("--top", type=int)
 @click.option("--sort", default="total_votes_for")
-def workers(ctx, account, top, sort):
+@click.option("--jsonl", is_flag=True, help="Stream workers as JSON lines")
+def workers(ctx, account, top, sort, jsonl):
     """ List all workers (of an account)
     """
 
@@ -59,22 +60,49 @@ def workers(ctx, account, top, sort):
             return "total_votes_for"
         return name
 
-    workers = Workers(account)
-    t = [["id", "name/url", "daily_pay", "votes", "time", "account"]]
-    sort = sort
+    if account:
+        account = Account(account, bitshares_instance=ctx.bitshares)
+        workers = ctx.bitshares.rpc.get_workers_by_account(account["id"])
+    else:
+        # Let the node skip expired workers
+        workers = ctx.bitshares.rpc.get_all_workers(False)
+    now = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+    workers = [worker for worker in workers if worker["work_end_date"] >= now]
+
     sort = normalize_sort_keys(sort)
-    if sort in ["total_votes_for"]:
-        workers_sorted = sorted(workers, key=lambda x: int(x[sort]), reverse=True)
+    if sort in ["total_votes_for", "total_votes_against", "daily_pay"]:
+        keys = [int(worker[sort]) for worker in workers]
     elif sort == "id":
-        workers_sorted = sorted(
-            workers, key=lambda x: int(x[sort].split(".")[2]), reverse=True
-        )
+        keys = [int(worker["id"].split(".")[2]) for worker in workers]
     else:
-        workers_sorted = sorted(workers, key=lambda x: x[sort], reverse=True)
-    if top:
-        workers_sorted = workers_sorted[: top + 1]
+        keys = [worker[sort] for worker in workers]
+    order = sorted(range(len(workers)), key=keys.__getitem__, reverse=True)
+    workers_sorted = [workers[i] for i in order[:top]]
+
+    names = {
+        account["id"]: account["name"]
+        for account in get_objects(
+            ctx, set(worker["worker_account"] for worker in workers_sorted)
+        )
+        if account
+    }
+    t = [["id", "name/url", "daily_pay", "votes", "time", "account"]]
     for worker in workers_sorted:
-        if worker["work_end_date"] < datetime.datetime.utcnow():
+        if jsonl:
+            click.echo(
+                json.dumps(
+                    dict(
+                        id=worker["id"],
+                        name=worker["name"],
+                        url=worker["url"],
+                        daily_pay=int(worker["daily_pay"]),
+                        total_votes_for=int(worker["total_votes_for"]),
+                        work_begin_date=worker["work_begin_date"],
+                        work_end_date=worker["work_end_date"],
+                        account=names.get(worker["worker_account"]),
+                    )
+                )
+            )
             continue
         votes = Amount({"amount": worker["total_votes_for"], "asset_id": "1.3.0"})
         amount = Amount({"amount": worker["daily_pay"], "asset_id": "1.3.0"})
@@ -84,10 +112,11 @@ def workers(ctx, account, top, sort):
                 "{name}\n{url}".format(**worker),
                 str(amount),
                 str(votes),
-                "{work_begin_date:%Y-%m-%d}\n-\n{work_end_date:%Y-%m-%d}".format(
-                    **worker
+                "{}\n-\n{}".format(
+                    worker["work_begin_date"][:10], worker["work_end_date"][:10]
                 ),
-                str(Account(worker["worker_account"])["name"]),
+                names.get(worker["worker_account"], worker["worker_account"]),
             ]
         )
-    print_table(t)
+    if not jsonl:
+        print_table(t)